@@ -1,9 +1,21 @@
 import os
+import orjson
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
+from kombu.serialization import register
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ai_call_system.settings')
 
+# orjson serializer for task/result payloads; encodes UUIDs and datetimes natively
+register(
+    'orjson',
+    lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+    orjson.loads,
+    content_type='application/x-orjson',
+    content_encoding='binary'
+)
+
 app = Celery('ai_call_system')
 
 # Using a string here means the worker doesn't have to serialize
@@ -15,6 +27,36 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+
+@worker_init.connect
+def patch_psycopg_for_green_pool(**kwargs):
+    """
+    On eventlet workers (-P eventlet), make psycopg2 yield to the hub while it
+    waits on PostgreSQL instead of blocking every green thread in the process
+    """
+    from eventlet.patcher import is_monkey_patched
+    
+    if is_monkey_patched('socket'):
+        from psycogreen.eventlet import patch_psycopg
+        patch_psycopg()
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """
+    Give each forked worker its own DB connections and Twilio/OpenAI HTTP
+    pools, which it then keeps (subject to CONN_MAX_AGE) for its whole lifetime.
+    Eventlet workers are not forked and run with DB_CONN_MAX_AGE=0 instead
+    """
+    from django.db import connections
+    from ai_integration.services.ai_service import ai_service
+    from calls.services.twilio_service import twilio_service
+    
+    connections.close_all()
+    twilio_service.reset_client()
+    ai_service.reset_client()
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -103,6 +103,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between Celery task runs instead of
+        # reconnecting on every beat-triggered invocation. Green-thread
+        # (eventlet) workers must run with DB_CONN_MAX_AGE=0: each greenlet
+        # gets its own connection, and persistent ones are never reused
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=300, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -237,23 +243,79 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_ALL_ORIGINS = DEBUG
 
+# Cache shared by web and worker processes (queue markers, idempotency keys)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://localhost:6379/0'),
+    }
+}
+
 # Celery Configuration
 CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')
-CELERY_ACCEPT_CONTENT = ['json']
-CELERY_TASK_SERIALIZER = 'json'
-CELERY_RESULT_SERIALIZER = 'json'
+# orjson is registered in ai_call_system/celery.py; plain json is still
+# accepted so messages queued before a deploy can be consumed
+CELERY_ACCEPT_CONTENT = ['orjson', 'json']
+CELERY_TASK_SERIALIZER = 'orjson'
+CELERY_RESULT_SERIALIZER = 'orjson'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
+# Recovery and housekeeping tasks the system relies on. The database
+# scheduler installs these as periodic tasks when beat starts, so they
+# never depend on someone adding them in the admin
+CELERY_BEAT_SCHEDULE = {
+    'reap-stale-queue-claims': {
+        'task': 'calls.autonomous_agent.reap_stale_queue_claims',
+        'schedule': 300.0,
+    },
+    'flush-kb-usage-counters': {
+        'task': 'calls.autonomous_agent.flush_kb_usage_counters',
+        'schedule': 60.0,
+    },
+    'requeue-stale-csv-uploads': {
+        'task': 'calls.tasks.requeue_stale_csv_uploads',
+        'schedule': 900.0,
+    },
+}
+
+# Call tasks run long; reserve one message per worker slot so nothing waits
+# behind a busy slot while another sits idle (start workers with -Ofair).
+# Tasks ack on receipt; only tasks with their own redelivery guard (e.g.
+# autonomous_agent_call) opt into acks_late
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Pool and concurrency for workers started without -P/-c; the green-thread
+# worker commands below pass their own. 0 means one process per CPU.
+CELERY_WORKER_POOL = config('CELERY_WORKER_POOL', default='prefork')
+CELERY_WORKER_CONCURRENCY = config('CELERY_WORKER_CONCURRENCY', default=0, cast=int) or None
+
+# I/O-bound dispatcher tasks run on a dedicated green-thread worker:
+#   DB_CONN_MAX_AGE=0 celery -A ai_call_system worker -Q io -P eventlet -c 50 -Ofair
+# Call initiation gets its own queue so dispatching never waits behind it:
+#   DB_CONN_MAX_AGE=0 celery -A ai_call_system worker -Q calls -P eventlet -c 100 -Ofair
+# Result handling waits on the AI service:
+#   DB_CONN_MAX_AGE=0 celery -A ai_call_system worker -Q network -P eventlet -c 100 -Ofair
+# Everything else (e.g. dynamic_call_scheduler, DB-heavy) stays on the
+# default prefork worker.
+CELERY_TASK_ROUTES = {
+    'calls.autonomous_agent.process_call_queue': {'queue': 'io'},
+    'calls.autonomous_agent.autonomous_agent_call': {'queue': 'calls'},
+    'calls.tasks.process_outbound_call': {'queue': 'calls'},
+    'calls.autonomous_agent.process_autonomous_call_result': {'queue': 'network'},
+}
+
 # Twilio Configuration  
 TWILIO_ACCOUNT_SID = config('TWILIO_ACCOUNT_SID', default='')
 TWILIO_AUTH_TOKEN = config('TWILIO_AUTH_TOKEN', default='')
 TWILIO_PHONE_NUMBER = config('TWILIO_PHONE_NUMBER', default='')
+TWILIO_HTTP_POOL_SIZE = config('TWILIO_HTTP_POOL_SIZE', default=50, cast=int)
 
 # OpenAI Configuration
 OPENAI_API_KEY = config('OPENAI_API_KEY', default='')
 OPENAI_MODEL = config('OPENAI_MODEL', default='gpt-4')
+OPENAI_HTTP_POOL_SIZE = config('OPENAI_HTTP_POOL_SIZE', default=100, cast=int)
 
 # Call Settings
 ENABLE_CALL_RECORDING = config('ENABLE_CALL_RECORDING', default=True, cast=bool)
@@ -261,6 +323,7 @@ RECORDING_WEBHOOK_URL = config('RECORDING_WEBHOOK_URL', default='')
 MAX_CONVERSATION_LENGTH = config('MAX_CONVERSATION_LENGTH', default=10000, cast=int)
 AI_TEMPERATURE = config('AI_TEMPERATURE', default=0.7, cast=float)
 AI_MAX_TOKENS = config('AI_MAX_TOKENS', default=500, cast=int)
+CALL_QUEUE_BATCH_SIZE = config('CALL_QUEUE_BATCH_SIZE', default=100, cast=int)
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.7 on 2026-10-16 09:00
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# PostgreSQL only: the trigger keeps search_vector in step with title/content and
+# the GIN index serves the @@ match in search_knowledge_by_intent
+POSTGRES_FORWARD_SQL = [
+    """
+    CREATE TRIGGER agent_kb_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, content ON agent_knowledge_base
+    FOR EACH ROW EXECUTE FUNCTION
+    tsvector_update_trigger(search_vector, 'pg_catalog.english', title, content)
+    """,
+    """
+    UPDATE agent_knowledge_base
+    SET search_vector = to_tsvector('pg_catalog.english', coalesce(title, '') || ' ' || coalesce(content, ''))
+    """,
+    'CREATE INDEX agent_kb_search_vector_idx ON agent_knowledge_base USING gin (search_vector)',
+]
+
+POSTGRES_REVERSE_SQL = [
+    'DROP INDEX IF EXISTS agent_kb_search_vector_idx',
+    'DROP TRIGGER IF EXISTS agent_kb_search_vector_update ON agent_knowledge_base',
+]
+
+
+def _run_on_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_integration', '0002_conversationtrainingdata_conversationpattern_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agentknowledgebase',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            _run_on_postgres(POSTGRES_FORWARD_SQL),
+            _run_on_postgres(POSTGRES_REVERSE_SQL),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.7 on 2026-10-16 09:00
+
+from django.db import migrations
+
+# PostgreSQL only: serves the trigger_phrases ?| match in search_knowledge_by_intent
+POSTGRES_FORWARD_SQL = (
+    'CREATE INDEX agent_kb_trigger_phrases_idx ON agent_knowledge_base USING gin (trigger_phrases)'
+)
+POSTGRES_REVERSE_SQL = 'DROP INDEX IF EXISTS agent_kb_trigger_phrases_idx'
+
+
+def _run_on_postgres(statement):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_integration', '0003_agentknowledgebase_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run_on_postgres(POSTGRES_FORWARD_SQL),
+            _run_on_postgres(POSTGRES_REVERSE_SQL),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import httpx
 import openai
 from django.conf import settings
 from ai_integration.models import AIConversation, AIMessage, AIProvider
@@ -17,6 +18,42 @@ class AIService:
             openai.api_key = self.provider.api_key
             if self.provider.api_endpoint:
                 openai.api_base = self.provider.api_endpoint
+        self._client = None
+    
+    @property
+    def client(self):
+        """
+        Shared OpenAI client; built on first use so importing the service
+        never needs credentials
+        """
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+    
+    def _build_client(self):
+        """
+        Create an OpenAI client backed by one pooled, keep-alive HTTPS connection pool
+        """
+        pool_size = getattr(settings, 'OPENAI_HTTP_POOL_SIZE', 100)
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size // 2),
+            timeout=30
+        )
+        
+        api_key = settings.OPENAI_API_KEY
+        base_url = None
+        if self.provider.provider_type == 'openai':
+            api_key = self.provider.api_key or api_key
+            base_url = self.provider.api_endpoint or None
+        
+        return openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=3, http_client=http_client)
+    
+    def reset_client(self):
+        """
+        Drop the client (and its connection pool) - used after fork so
+        worker processes never share sockets with their parent
+        """
+        self._client = None
     
     def _get_provider(self, provider_name):
         """Get AI provider configuration"""
@@ -7,6 +7,7 @@ conversation learning, and performance analytics.
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 import uuid
 import json
 
@@ -132,6 +133,9 @@ class AgentKnowledgeBase(models.Model):
     trigger_phrases = models.JSONField(default=list, blank=True)  # Phrases that should trigger this knowledge
     success_contexts = models.JSONField(default=list, blank=True)  # Contexts where this was successful
     
+    # Full-text index over title + content; filled by a database trigger on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     # Performance metrics
     usage_count = models.IntegerField(default=0)
     success_rate = models.FloatField(default=0.0)
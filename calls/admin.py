@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Call, CallConversation, CallTemplate, CallQueue
+from .models import Call, CallConversation, CallTemplate, CallQueue, CsvUploadJob
 
 @admin.register(Call)
 class CallAdmin(admin.ModelAdmin):
@@ -40,3 +40,9 @@ class CallQueueAdmin(admin.ModelAdmin):
     list_display = ['contact', 'status', 'priority', 'scheduled_time', 'attempt_count']
     list_filter = ['status', 'priority', 'created_at']
     search_fields = ['contact__first_name', 'contact__last_name']
+
+@admin.register(CsvUploadJob)
+class CsvUploadJobAdmin(admin.ModelAdmin):
+    list_display = ['original_filename', 'campaign', 'status', 'created_contacts', 'updated_contacts', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['original_filename', 'campaign__name']
@@ -2,6 +2,8 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Trim
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from datetime import timedelta
@@ -20,6 +22,14 @@ from scheduling.models import Campaign, CampaignContact
 
 logger = logging.getLogger(__name__)
 
+# Columns returned by the call queue list, matching CallQueueSerializer's
+# output (foreign keys as ids)
+CALL_QUEUE_LIST_FIELDS = (
+    'id', 'contact', 'call_template', 'campaign', 'status', 'priority', 'priority_rank',
+    'scheduled_time', 'max_attempts', 'attempt_count', 'call_config', 'task_id',
+    'created_by', 'created_at', 'updated_at', 'call', 'result_notes',
+)
+
 
 class CallViewSet(viewsets.ModelViewSet):
     """ViewSet for managing calls"""
@@ -405,7 +415,38 @@ class CallQueueViewSet(viewsets.ModelViewSet):
         if priority:
             queryset = queryset.filter(priority=priority)
         
-        return queryset.order_by('-priority', 'scheduled_time')
+        return queryset.order_by('priority_rank', 'scheduled_time')
+    
+    def list(self, request, *args, **kwargs):
+        """
+        List queue entries as plain dicts
+        
+        The related names are computed in the query and rows come back from
+        values(), so no model instances are built and no serializer fields
+        run per row; the page has the same keys as CallQueueSerializer.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).annotate(
+            contact_name=Trim(Concat('contact__first_name', Value(' '), 'contact__last_name')),
+            contact_phone=F('contact__phone_number'),
+            template_name=F('call_template__name')
+        ).values(*CALL_QUEUE_LIST_FIELDS, 'contact_name', 'contact_phone', 'template_name')
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self._drop_missing_template_names(page))
+        return Response(self._drop_missing_template_names(queryset))
+    
+    @staticmethod
+    def _drop_missing_template_names(rows):
+        """
+        CallQueueSerializer leaves template_name out for entries without a
+        template; drop the null the join produces so the keys match
+        """
+        rows = list(rows)
+        for row in rows:
+            if row['template_name'] is None:
+                del row['template_name']
+        return rows
     
     @action(detail=False, methods=['post'])
     def schedule_autonomous_calls(self, request):
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CallsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'calls'
+
+    def ready(self):
+        from calls import signals
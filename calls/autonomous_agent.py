@@ -10,26 +10,108 @@ This module implements fully automated AI agent calls that can:
 """
 
 from celery import shared_task
+from celery.exceptions import Retry
+from kombu.exceptions import OperationalError as BrokerOperationalError
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import Count, Exists, F, Max, Min, OuterRef, Q
 from django.utils import timezone
+from collections import OrderedDict, deque
 from datetime import timedelta
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, List, Any, Optional
 import logging
-import json
+import random
+import re
+import time
 
 from django.contrib.auth.models import User
 from calls.models import Call, CallQueue, CallTemplate
+from calls.services import dispatch_guard, kb_usage, queue_marker, retry_backoff, template_cache
 from calls.services.twilio_service import twilio_service
 from ai_integration.services.ai_service import ai_service
 from crm.models import Contact, ContactNote
 from scheduling.models import Campaign, CampaignContact
-from ai_integration.models import AIConversation, AIMessage
+from ai_integration.models import AIConversation
 from ai_integration.training_models import AgentKnowledgeBase
-from ai_integration.training_services import process_conversation_for_training_task
 
 
 logger = logging.getLogger(__name__)
 
-
-@shared_task(bind=True, max_retries=3)
+# Unpacks the columns the dispatch loop needs from a values() queue row
+_queue_row_fields = itemgetter('id', 'contact_id', 'contact__phone_number', 'call_template_id', 'call_config')
+
+# Call hour for each contact time-of-day preference: morning 9-11 AM,
+# afternoon 2-4 PM, evening 6-7 PM
+PREFERRED_CALL_HOURS = {
+    'morning': 9,
+    'afternoon': 14,
+    'evening': 18,
+}
+DEFAULT_CALL_HOUR = 10
+
+# Map call purposes to template types
+PURPOSE_TEMPLATE_TYPES = {
+    'sales': 'sales',
+    'support': 'support',
+    'appointment': 'appointment',
+    'follow_up': 'follow_up',
+    'survey': 'survey',
+    'reminder': 'appointment'
+}
+
+# Map campaign types to call purposes
+CAMPAIGN_CALL_PURPOSES = {
+    'bulk_calls': 'sales_outreach',
+    'drip_campaign': 'follow_up',
+    'appointment_reminders': 'appointment_booking',
+    'follow_up': 'follow_up',
+    'survey': 'survey'
+}
+
+# Delay before an autonomous callback, by the follow-up timeframe the AI chose
+CALLBACK_DELAYS = {
+    'immediate': timedelta(days=0),
+    '1_day': timedelta(days=1),
+    '1_week': timedelta(days=7),
+    '1_month': timedelta(days=30),
+}
+DEFAULT_CALLBACK_DELAY = CALLBACK_DELAYS['1_week']
+
+# Base agent personality and capabilities (the prompt templates below are
+# written for this persona)
+AGENT_PERSONA = {
+    'agent_name': 'Alex',
+    'company_name': 'TechSolutions',
+    'agent_role': 'AI Sales Representative',
+    'personality': 'professional, friendly, solution-focused'
+}
+
+# Contact columns autonomous_agent_call reads (do-not-call check + agent context)
+AGENT_CALL_CONTACT_FIELDS = (
+    'id', 'first_name', 'last_name', 'phone_number', 'do_not_call', 'company',
+    'job_title', 'lead_source', 'contact_type', 'ai_interaction_history',
+)
+
+# A claimed queue entry still without a task id after this long was never
+# published; well above the time a dispatcher takes to publish its batch
+STALE_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+# Pending CampaignContacts loaded per scheduling chunk
+CAMPAIGN_SCHEDULE_CHUNK_SIZE = 1000
+
+# Every weekday allowed (see _allowed_days_mask)
+ALL_DAYS_MASK = 0b1111111
+
+
+# Retry delays for autonomous_agent_call: 10s, 20s, 40s ... capped at 5 minutes
+AGENT_CALL_RETRY_BACKOFF = {'base': 10, 'cap': 300}
+
+# acks_late + reject_on_worker_lost: a worker dying mid-task hands the call back
+# to the broker instead of silently dropping it
+@shared_task(bind=True, max_retries=3, acks_late=True, reject_on_worker_lost=True)
 def autonomous_agent_call(self, contact_phone=None, contact_id=None, call_purpose='sales', context_data=None):
     """
     Initiate a fully autonomous AI agent call with dynamic agent selection
@@ -40,10 +122,14 @@ def autonomous_agent_call(self, contact_phone=None, contact_id=None, call_purpos
         call_purpose: Purpose of the call (sales, support, follow_up, appointment)
         context_data: Additional context for the AI agent
     """
+    task_id = self.request.id
+    initiation_claimed = False
+    dial_attempted = False
+    
     try:
         # Get contact by ID or phone
         if contact_id:
-            contact = Contact.objects.get(id=contact_id)
+            contact = Contact.objects.only(*AGENT_CALL_CONTACT_FIELDS).get(id=contact_id)
             phone_number = contact.phone_number
         elif contact_phone:
             phone_number = contact_phone
@@ -59,7 +145,7 @@ def autonomous_agent_call(self, contact_phone=None, contact_id=None, call_purpos
             raise ValueError("Either contact_id or contact_phone must be provided")
         
         # Skip if contact is on do-not-call list
-        if hasattr(contact, 'do_not_call') and contact.do_not_call:
+        if contact.do_not_call:
             logger.info(f"Skipping call to {phone_number} - on do-not-call list")
             return {'status': 'skipped', 'reason': 'do_not_call'}
         
@@ -73,15 +159,13 @@ def autonomous_agent_call(self, contact_phone=None, contact_id=None, call_purpos
         agent_name = agent_template.conversation_flow.get('agent_name', 'AI Agent')
         logger.info(f"🤖 {agent_name} initiating {call_purpose} call to {phone_number}")
         
-        # Create autonomous call record
-        call = Call.objects.create(
-            call_type='outbound',
-            contact=contact,
-            from_number=twilio_service.from_number,
-            to_number=contact.phone_number,
-            ai_enabled=True,
-            status='initiated'
-        )
+        # Dial at most once per task: retries and redeliveries keep the task id,
+        # and Twilio call creation is not idempotent
+        if task_id:
+            if not dispatch_guard.claim_call_initiation(task_id):
+                logger.warning(f"⚠️ Task {task_id} may already have dialled {phone_number}, skipping")
+                return {'status': 'deduped'}
+            initiation_claimed = True
         
         # Build AI agent context
         agent_context = _build_agent_context(contact, call_purpose, context_data)
@@ -93,13 +177,23 @@ def autonomous_agent_call(self, contact_phone=None, contact_id=None, call_purpos
             system_prompt=agent_context['system_prompt']
         )
         
-        call.ai_conversation_id = str(conversation.id)
-        call.save()
+        # Create autonomous call record, already linked to its conversation
+        call = Call.objects.create(
+            call_type='outbound',
+            contact=contact,
+            campaign_id=(context_data or {}).get('campaign_id'),
+            from_number=twilio_service.from_number,
+            to_number=contact.phone_number,
+            ai_enabled=True,
+            status='initiated',
+            ai_conversation_id=str(conversation.id)
+        )
         
         # Generate webhook URL for autonomous handling
         webhook_url = f"https://yourdomain.com/webhooks/twilio/autonomous-agent/?call_id={call.id}&purpose={call_purpose}"
         
         # Initiate the call
+        dial_attempted = True
         result = twilio_service.initiate_call(
             to_number=contact.phone_number,
             webhook_url=webhook_url,
@@ -114,7 +208,7 @@ def autonomous_agent_call(self, contact_phone=None, contact_id=None, call_purpos
         if result['success']:
             call.twilio_call_sid = result['call_sid']
             call.started_at = timezone.now()
-            call.save()
+            call.save(update_fields=['twilio_call_sid', 'started_at'])
             
             logger.info(f"Autonomous agent call initiated: {result['call_sid']} to {contact.full_name}")
             
@@ -125,32 +219,38 @@ def autonomous_agent_call(self, contact_phone=None, contact_id=None, call_purpos
             }
         else:
             call.status = 'failed'
-            call.save()
+            call.save(update_fields=['status'])
+            
+            # Only a rejection by Twilio proves no call exists; after a timeout
+            # or dropped connection a retry could ring the contact twice
+            if not result.get('rejected'):
+                return {'status': 'failed', 'error': result['error']}
             
             # Retry logic
+            if initiation_claimed:
+                dispatch_guard.release_call_initiation(task_id)
             if self.request.retries < self.max_retries:
-                self.retry(countdown=300)  # Retry after 5 minutes
+                raise self.retry(countdown=retry_backoff.countdown(self.request.retries, **AGENT_CALL_RETRY_BACKOFF))
             
             return {'status': 'failed', 'error': result['error']}
-            
+    
+    except Retry:
+        raise
     except Exception as e:
         logger.error(f"Error in autonomous agent call: {str(e)}")
+        if dial_attempted:
+            return {'status': 'error', 'error': str(e)}
+        
+        if initiation_claimed:
+            dispatch_guard.release_call_initiation(task_id)
         if self.request.retries < self.max_retries:
-            self.retry(countdown=60)
+            raise self.retry(exc=e, countdown=retry_backoff.countdown(self.request.retries, **AGENT_CALL_RETRY_BACKOFF))
         return {'status': 'error', 'error': str(e)}
 
 
 def _build_agent_context(contact, call_purpose, context_data=None):
     """Build comprehensive context for the autonomous AI agent"""
     
-    # Base agent personality and capabilities
-    base_context = {
-        'agent_name': 'Alex',
-        'company_name': 'TechSolutions',
-        'agent_role': 'AI Sales Representative',
-        'personality': 'professional, friendly, solution-focused'
-    }
-    
     # Contact-specific information
     contact_info = {
         'name': contact.full_name,
@@ -161,18 +261,9 @@ def _build_agent_context(contact, call_purpose, context_data=None):
         'contact_type': contact.contact_type
     }
     
-    # Purpose-specific system prompts
-    purpose_prompts = {
-        'sales_outreach': _get_sales_outreach_prompt(contact_info, context_data),
-        'product_demo': _get_product_demo_prompt(contact_info, context_data),
-        'follow_up': _get_follow_up_prompt(contact_info, context_data),
-        'customer_support': _get_support_prompt(contact_info, context_data),
-        'appointment_booking': _get_appointment_prompt(contact_info, context_data),
-        'survey': _get_survey_prompt(contact_info, context_data),
-        'renewal_reminder': _get_renewal_prompt(contact_info, context_data)
-    }
-    
-    system_prompt = purpose_prompts.get(call_purpose, purpose_prompts['sales_outreach'])
+    # Purpose-specific system prompt; only the selected one is rendered
+    prompt_builder = PROMPT_DISPATCH.get(call_purpose, _get_sales_outreach_prompt)
+    system_prompt = prompt_builder(contact_info, context_data or {})
     
     return {
         'system_prompt': system_prompt,
@@ -295,6 +386,89 @@ AUTONOMOUS CAPABILITIES:
 - Escalate complex issues to human agents"""
 
 
+def _get_appointment_prompt(contact_info, context_data):
+    """Generate autonomous appointment booking prompt"""
+    return f"""You are Alex from TechSolutions calling {contact_info['name']} to book an appointment.
+
+CALL OBJECTIVE: Agree on a specific date and time for an appointment.
+
+APPOINTMENT CONTEXT:
+- Appointment type: {context_data.get('appointment_type', 'consultation')}
+- Preferred times: {context_data.get('preferred_times', 'not specified')}
+- Duration: {context_data.get('duration', '30 minutes')}
+
+BOOKING FLOW:
+1. GREETING: Introduce yourself and explain the reason for the call
+2. AVAILABILITY: Ask which days and times work best for them
+3. PROPOSAL: Offer two or three specific time slots
+4. CONFIRMATION: Repeat the agreed date, time and format back to them
+5. CLOSING: Let them know a confirmation will follow
+
+AUTONOMOUS DECISIONS:
+- If a slot is agreed: Confirm it and schedule the appointment
+- If they need to check their calendar: Offer to call back at a set time
+- If not interested: Thank them and end the call politely"""
+
+
+def _get_survey_prompt(contact_info, context_data):
+    """Generate autonomous customer survey prompt"""
+    return f"""You are Alex from TechSolutions calling {contact_info['name']} to collect feedback.
+
+CALL OBJECTIVE: Complete a short satisfaction survey and capture honest feedback.
+
+SURVEY CONTEXT:
+- Survey topic: {context_data.get('survey_topic', 'overall experience')}
+- Number of questions: {context_data.get('question_count', 'about 5')}
+
+SURVEY FLOW:
+1. PERMISSION: Explain the survey takes a few minutes and ask if now is a good time
+2. QUESTIONS: Ask one question at a time and wait for a full answer
+3. CLARIFICATION: Ask a short follow-up when an answer is unclear
+4. OPEN FEEDBACK: Invite any other comments
+5. THANK YOU: Thank them for their time
+
+AUTONOMOUS DECISIONS:
+- If they are busy: Offer to call back at a better time
+- If they raise a problem: Note it and offer a support follow-up
+- If they decline: Thank them and end the call politely"""
+
+
+def _get_renewal_prompt(contact_info, context_data):
+    """Generate autonomous renewal reminder prompt"""
+    return f"""You are Alex from TechSolutions calling {contact_info['name']} at {contact_info['company']} about their upcoming renewal.
+
+CALL OBJECTIVE: Remind them of the renewal and secure their decision to renew.
+
+RENEWAL CONTEXT:
+- Plan: {context_data.get('plan_name', 'current plan')}
+- Renewal date: {context_data.get('renewal_date', 'coming up soon')}
+- Account status: {context_data.get('account_status', 'active')}
+
+CONVERSATION FLOW:
+1. GREETING: Introduce yourself and mention the upcoming renewal
+2. CHECK-IN: Ask how the platform is working for them
+3. VALUE RECAP: Highlight the results they have achieved
+4. RENEWAL: Confirm they would like to continue, and mention any upgrade options
+5. CLOSING: Confirm next steps
+
+AUTONOMOUS DECISIONS:
+- If renewing: Confirm and note any plan changes
+- If hesitant: Address concerns and schedule a follow-up
+- If cancelling: Capture the reason and flag for account management"""
+
+
+# Prompt builder for each call purpose; sales outreach is the fallback
+PROMPT_DISPATCH = {
+    'sales_outreach': _get_sales_outreach_prompt,
+    'product_demo': _get_product_demo_prompt,
+    'follow_up': _get_follow_up_prompt,
+    'customer_support': _get_support_prompt,
+    'appointment_booking': _get_appointment_prompt,
+    'survey': _get_survey_prompt,
+    'renewal_reminder': _get_renewal_prompt,
+}
+
+
 @shared_task
 def schedule_autonomous_campaign_calls(campaign_id):
     """
@@ -303,53 +477,41 @@ def schedule_autonomous_campaign_calls(campaign_id):
     try:
         campaign = Campaign.objects.get(id=campaign_id)
         
-        # Get all pending contacts in the campaign
+        # Get all pending contacts in the campaign, in pk order so they can be
+        # paged by key
         pending_contacts = CampaignContact.objects.filter(
             campaign=campaign,
             status='pending'
-        ).select_related('contact')
+        ).select_related('contact').only(
+            'id', 'contact_id', 'status', 'notes', 'scheduled_time', 'updated_at',
+            'contact__id', 'contact__do_not_call'
+        ).order_by('pk')
         
         scheduled_count = 0
         
-        for campaign_contact in pending_contacts:
-            # Check if contact allows calls
-            if campaign_contact.contact.do_not_call:
-                campaign_contact.status = 'skipped'
-                campaign_contact.result_notes = 'On do-not-call list'
-                campaign_contact.save()
-                continue
-            
-            # Schedule autonomous call
-            call_time = _calculate_optimal_call_time(
-                campaign_contact.contact,
-                campaign.allowed_calling_hours_start,
-                campaign.allowed_calling_hours_end,
-                campaign.allowed_days_of_week
-            )
-            
-            # Determine call purpose based on campaign type
-            call_purpose = _get_call_purpose_from_campaign(campaign)
-            
-            # Schedule the autonomous call
-            autonomous_agent_call.apply_async(
-                args=[
-                    str(campaign_contact.contact.id),
-                    call_purpose,
-                    {
-                        'campaign_id': str(campaign.id),
-                        'campaign_name': campaign.name,
-                        'campaign_type': campaign.campaign_type
-                    }
-                ],
-                eta=call_time
-            )
-            
-            # Update campaign contact
-            campaign_contact.status = 'scheduled'
-            campaign_contact.scheduled_time = call_time
-            campaign_contact.save()
-            
-            scheduled_count += 1
+        # Determine call purpose based on campaign type
+        call_purpose = _get_call_purpose_from_campaign(campaign)
+        context_data = {
+            'campaign_id': str(campaign.id),
+            'campaign_name': campaign.name,
+            'campaign_type': campaign.campaign_type
+        }
+        
+        # Work through the campaign one chunk at a time so memory stays bounded
+        # regardless of campaign size. Keyset paging (rather than a streaming
+        # cursor) is safe to interleave with the UPDATEs below on every backend.
+        last_pk = None
+        with autonomous_agent_call.app.producer_pool.acquire(block=True) as producer:
+            while True:
+                chunk_query = pending_contacts if last_pk is None else pending_contacts.filter(pk__gt=last_pk)
+                chunk = list(chunk_query[:CAMPAIGN_SCHEDULE_CHUNK_SIZE])
+                if not chunk:
+                    break
+                last_pk = chunk[-1].pk
+                
+                scheduled_count += _schedule_campaign_contact_chunk(
+                    campaign, chunk, call_purpose, context_data, producer
+                )
         
         logger.info(f"Scheduled {scheduled_count} autonomous calls for campaign: {campaign.name}")
         
@@ -364,50 +526,152 @@ def schedule_autonomous_campaign_calls(campaign_id):
         return {'status': 'error', 'error': str(e)}
 
 
-def _calculate_optimal_call_time(contact, start_hour, end_hour, allowed_days):
-    """Calculate optimal time to call based on contact preferences and campaign rules"""
-    from datetime import datetime, time
-    import random
+def _schedule_campaign_contact_chunk(campaign, chunk, call_purpose, context_data, producer):
+    """
+    Schedule one chunk of pending CampaignContacts and persist their new status
+    
+    Returns:
+        int: Number of calls scheduled
+    """
+    skipped_contacts = []
+    scheduled_contacts = []
+    
+    for campaign_contact in chunk:
+        # Check if contact allows calls
+        if campaign_contact.contact.do_not_call:
+            campaign_contact.status = 'skipped'
+            campaign_contact.notes = 'On do-not-call list'
+            skipped_contacts.append(campaign_contact)
+        else:
+            scheduled_contacts.append(campaign_contact)
+    
+    # Call times for the whole chunk in one pass
+    call_times = _calculate_optimal_call_times_batch(
+        [campaign_contact.contact for campaign_contact in scheduled_contacts],
+        campaign.allowed_calling_hours_start,
+        campaign.allowed_calling_hours_end,
+        campaign.allowed_days_of_week
+    )
+    
+    # Publish every eta-tagged call over the shared pooled producer
+    for campaign_contact, call_time in zip(scheduled_contacts, call_times):
+        # Schedule the autonomous call
+        autonomous_agent_call.apply_async(
+            kwargs={
+                'contact_id': str(campaign_contact.contact_id),
+                'call_purpose': call_purpose,
+                'context_data': context_data
+            },
+            eta=call_time,
+            producer=producer
+        )
+        
+        # Update campaign contact
+        campaign_contact.status = 'scheduled'
+        campaign_contact.scheduled_time = call_time
+    
+    # Persist the status changes in batched UPDATEs; bulk_update skips
+    # auto_now, so stamp updated_at explicitly
+    now = timezone.now()
+    for campaign_contact in chunk:
+        campaign_contact.updated_at = now
+    
+    with transaction.atomic():
+        CampaignContact.objects.bulk_update(
+            skipped_contacts, ['status', 'notes', 'updated_at'], batch_size=500
+        )
+        CampaignContact.objects.bulk_update(
+            scheduled_contacts, ['status', 'scheduled_time', 'updated_at'], batch_size=500
+        )
+    
+    return len(scheduled_contacts)
+
+
+def _earliest_campaign_call_time(start_hour, end_hour, allowed_days):
+    """Earliest slot inside the campaign's calling window, before per-contact spreading"""
     
     # Start with current time
     call_time = timezone.now()
     
-    # If contact has preferred calling time, try to honor it
-    if contact.best_time_to_call:
-        # Parse preferred time (implementation depends on format)
-        # For now, use campaign defaults
-        pass
+    # Opening of today's window, normalized to the whole hour
+    window_start = call_time.replace(hour=start_hour.hour, minute=0, second=0, microsecond=0)
     
     # Ensure call is within allowed hours
     if call_time.hour < start_hour.hour:
-        call_time = call_time.replace(hour=start_hour.hour, minute=0)
+        call_time = window_start
     elif call_time.hour >= end_hour.hour:
         # Schedule for next allowed day
-        call_time = call_time.replace(hour=start_hour.hour, minute=0) + timedelta(days=1)
+        call_time = window_start + timedelta(days=1)
     
     # Ensure call is on allowed day of week
-    while call_time.weekday() + 1 not in allowed_days:  # weekday() returns 0-6, we need 1-7
-        call_time += timedelta(days=1)
-        call_time = call_time.replace(hour=start_hour.hour, minute=0)
-    
-    # Add some randomization to spread calls throughout the day
-    random_minutes = random.randint(0, (end_hour.hour - start_hour.hour) * 60)
-    call_time += timedelta(minutes=random_minutes)
+    days_ahead = _days_until_next_allowed(call_time.weekday(), _allowed_days_mask(allowed_days))
+    if days_ahead:
+        call_time = (call_time + timedelta(days=days_ahead)).replace(
+            hour=start_hour.hour, minute=0, second=0, microsecond=0
+        )
     
     return call_time
 
 
+def _allowed_days_mask(allowed_days):
+    """
+    Bitmask of allowed weekdays: bit 0 = Monday ... bit 6 = Sunday
+    
+    allowed_days uses 1-7 (Mon-Sun); an empty or invalid list allows every day.
+    """
+    mask = 0
+    for day in allowed_days or ():
+        if 1 <= day <= 7:
+            mask |= 1 << (day - 1)
+    return mask or ALL_DAYS_MASK
+
+
+def _days_until_next_allowed(weekday, mask):
+    """Days from ``weekday`` (0-6, as datetime.weekday()) to the next allowed day in ``mask``"""
+    
+    # Rotate the week so today is bit 0; the lowest set bit is the distance
+    rotated = ((mask >> weekday) | (mask << (7 - weekday))) & ALL_DAYS_MASK
+    return (rotated & -rotated).bit_length() - 1
+
+
+@lru_cache(maxsize=32)
+def _minute_offsets(window_minutes):
+    """Immutable 0..window_minutes minute offsets, shared across campaigns"""
+    return tuple(timedelta(minutes=minutes) for minutes in range(window_minutes + 1))
+
+
+def _calculate_optimal_call_times_batch(contacts, start_hour, end_hour, allowed_days):
+    """
+    Calculate call times for many contacts under the same campaign rules
+    
+    The calling-window/weekday resolution does not depend on the contact, so
+    it runs once; each contact then gets its own random offset to spread
+    calls throughout the day.
+    
+    Returns:
+        list: Call times in the same order as ``contacts``
+    """
+    # Contact preferences (best_time_to_call) are not parsed yet; every
+    # contact uses the campaign defaults
+    call_time = _earliest_campaign_call_time(start_hour, end_hour, allowed_days)
+    
+    # Add some randomization to spread calls throughout the day. The window
+    # holds at most 24 * 60 + 1 offsets, so build each timedelta once and
+    # sample from them; per contact only the datetime addition remains
+    window_minutes = max((end_hour.hour - start_hour.hour) * 60, 0)
+    offsets = _minute_offsets(window_minutes)
+    
+    return [call_time + offset for offset in random.choices(offsets, k=len(contacts))]
+
+
+def _calculate_optimal_call_time(contact, start_hour, end_hour, allowed_days):
+    """Calculate optimal time to call based on contact preferences and campaign rules"""
+    return _calculate_optimal_call_times_batch([contact], start_hour, end_hour, allowed_days)[0]
+
+
 def _get_call_purpose_from_campaign(campaign):
     """Determine call purpose based on campaign type"""
-    purpose_mapping = {
-        'bulk_calls': 'sales_outreach',
-        'drip_campaign': 'follow_up',
-        'appointment_reminders': 'appointment_booking',
-        'follow_up': 'follow_up',
-        'survey': 'survey'
-    }
-    
-    return purpose_mapping.get(campaign.campaign_type, 'sales_outreach')
+    return CAMPAIGN_CALL_PURPOSES.get(campaign.campaign_type, 'sales_outreach')
 
 
 @shared_task
@@ -416,31 +680,34 @@ def process_autonomous_call_result(call_id, conversation_outcome):
     Process the results of an autonomous call and take appropriate actions
     """
     try:
-        call = Call.objects.get(id=call_id)
+        call = Call.objects.select_related('contact').get(id=call_id)
         
-        # Analyze conversation outcome
+        # Analyze conversation outcome (AI request; kept outside the transaction)
         outcome_data = _analyze_call_outcome(conversation_outcome)
         
-        # Update call record
-        call.outcome = outcome_data['primary_outcome']
-        call.summary = outcome_data['summary']
-        call.follow_up_required = outcome_data['follow_up_needed']
-        call.save()
-        
-        # Create contact note
-        ContactNote.objects.create(
-            contact=call.contact,
-            title=f"Autonomous Call - {outcome_data['primary_outcome']}",
-            content=outcome_data['detailed_summary'],
-            note_type='call_summary',
-            created_by_id=1  # System user
-        )
-        
-        # Take autonomous actions based on outcome
-        _take_autonomous_actions(call, outcome_data)
-        
-        # Update contact interaction history
-        _update_contact_interaction_history(call.contact, outcome_data)
+        # All result writes share one transaction: one commit instead of one
+        # per statement, and no half-applied outcome if a later write fails
+        with transaction.atomic():
+            # Update call record
+            call.outcome = outcome_data['primary_outcome']
+            call.summary = outcome_data['summary']
+            call.follow_up_required = outcome_data['follow_up_needed']
+            call.save(update_fields=['outcome', 'summary', 'follow_up_required'])
+            
+            # Create contact note
+            ContactNote.objects.create(
+                contact=call.contact,
+                title=f"Autonomous Call - {outcome_data['primary_outcome']}",
+                content=outcome_data['detailed_summary'],
+                note_type='call_summary',
+                created_by_id=1  # System user
+            )
+            
+            # Take autonomous actions based on outcome
+            _take_autonomous_actions(call, outcome_data)
+            
+            # Update contact interaction history
+            _update_contact_interaction_history(call.contact, outcome_data)
         
         logger.info(f"Processed autonomous call result for {call.contact.full_name}: {outcome_data['primary_outcome']}")
         
@@ -503,7 +770,7 @@ def _take_autonomous_actions(call, outcome_data):
         
         CallQueue.objects.create(
             contact=call.contact,
-            call_template=CallTemplate.objects.filter(template_type='sales').first(),
+            call_template_id=template_cache.get_active_template_pk('sales', template_cache.current_version()),
             priority='high',
             scheduled_time=demo_time,
             created_by_id=1,  # System user
@@ -514,12 +781,11 @@ def _take_autonomous_actions(call, outcome_data):
     
     elif outcome_data['next_best_action'] == 'callback':
         # Schedule callback
-        callback_days = {'immediate': 0, '1_day': 1, '1_week': 7, '1_month': 30}
-        callback_time = timezone.now() + timedelta(days=callback_days.get(outcome_data['follow_up_timeframe'], 7))
+        callback_time = timezone.now() + CALLBACK_DELAYS.get(outcome_data['follow_up_timeframe'], DEFAULT_CALLBACK_DELAY)
         
         CallQueue.objects.create(
             contact=call.contact,
-            call_template=CallTemplate.objects.filter(template_type='follow_up').first(),
+            call_template_id=template_cache.get_active_template_pk('follow_up', template_cache.current_version()),
             priority='normal',
             scheduled_time=callback_time,
             created_by_id=1,
@@ -552,37 +818,35 @@ def _update_contact_interaction_history(contact, outcome_data):
         'next_action': outcome_data['next_best_action']
     }
     
-    # Keep last 10 interactions
-    if 'interactions' not in contact.ai_interaction_history:
-        contact.ai_interaction_history['interactions'] = []
-    
-    contact.ai_interaction_history['interactions'].append(interaction_record)
-    contact.ai_interaction_history['interactions'] = contact.ai_interaction_history['interactions'][-10:]
+    # Keep last 10 interactions; the bounded deque drops the oldest on append
+    interactions = deque(contact.ai_interaction_history.get('interactions', []), maxlen=10)
+    interactions.append(interaction_record)
+    contact.ai_interaction_history['interactions'] = list(interactions)
     
     # Update last contacted
     contact.last_contacted = timezone.now()
-    contact.save()
+    contact.save(update_fields=['ai_interaction_history', 'last_contacted', 'updated_at'])
 
 
 # Convenience functions for triggering autonomous calls
 
 def trigger_sales_outreach_call(contact_id, context=None):
     """Trigger an autonomous sales outreach call"""
-    return autonomous_agent_call.delay(contact_id, 'sales_outreach', context)
+    return autonomous_agent_call.delay(contact_id=contact_id, call_purpose='sales_outreach', context_data=context)
 
 
 def trigger_follow_up_call(contact_id, previous_interaction, context=None):
     """Trigger an autonomous follow-up call"""
     context = context or {}
     context['previous_interaction'] = previous_interaction
-    return autonomous_agent_call.delay(contact_id, 'follow_up', context)
+    return autonomous_agent_call.delay(contact_id=contact_id, call_purpose='follow_up', context_data=context)
 
 
 def trigger_support_call(contact_id, issue_type, context=None):
     """Trigger an autonomous customer support call"""
     context = context or {}
     context['issue_type'] = issue_type
-    return autonomous_agent_call.delay(contact_id, 'customer_support', context)
+    return autonomous_agent_call.delay(contact_id=contact_id, call_purpose='customer_support', context_data=context)
 
 
 def select_agent_for_purpose(call_purpose):
@@ -595,30 +859,16 @@ def select_agent_for_purpose(call_purpose):
     Returns:
         CallTemplate: The best matching agent template
     """
-    # Map purposes to template types
-    purpose_to_template_type = {
-        'sales': 'sales',
-        'support': 'support', 
-        'appointment': 'appointment',
-        'follow_up': 'follow_up',
-        'survey': 'survey',
-        'reminder': 'appointment'
-    }
-    
     # Get template type for this purpose
-    template_type = purpose_to_template_type.get(call_purpose, 'sales')
-    
-    # Try to find template by type
-    template = CallTemplate.objects.filter(
-        template_type=template_type,
-        is_active=True
-    ).first()
+    template_type = PURPOSE_TEMPLATE_TYPES.get(call_purpose, 'sales')
     
-    if template:
-        return template
+    # Which template serves a type only changes when a template is saved or
+    # deleted, so the lookup (including the any-active fallback) is cached
+    template_pk = template_cache.get_active_template_pk(template_type, template_cache.current_version())
+    if template_pk is None:
+        return None
     
-    # Ultimate fallback - any active template
-    return CallTemplate.objects.filter(is_active=True).first()
+    return CallTemplate.objects.get(pk=template_pk)
 
 
 @shared_task(bind=True)
@@ -635,42 +885,78 @@ def dynamic_call_scheduler(self):
     try:
         logger.info("🔄 Running dynamic call scheduler...")
         
-        # Get active campaigns
-        active_campaigns = Campaign.objects.filter(status='active')
+        # Get active campaigns, loading only the scheduling columns
+        active_campaigns = Campaign.objects.filter(status='active').only(
+            'id', 'name', 'campaign_type', 'allowed_calling_hours_start',
+            'allowed_calling_hours_end', 'allowed_days_of_week', 'max_calls_per_day'
+        )
         
         scheduled_calls = 0
+        admin_user = None
+        current_time = timezone.now()
         
         for campaign in active_campaigns:
+            # Campaign-wide checks first: a closed window skips the contact query entirely
+            if not is_campaign_calling_window_open(campaign, current_time):
+                continue
+            
             # Get contacts for this campaign
-            campaign_contacts = get_contacts_for_campaign(campaign)
+            campaign_contacts = list(get_contacts_for_campaign(campaign))
+            if not campaign_contacts:
+                continue
+            
+            # Both call counts are shared by every contact in the batch, so
+            # fetch them once per campaign rather than once per contact
+            recently_called_ids = get_recently_called_contact_ids([contact.id for contact in campaign_contacts])
+            today_calls = get_campaign_calls_today(campaign)
             
             # Schedule calls based on campaign rules
-            for contact in campaign_contacts:
-                if should_call_contact(contact, campaign):
-                    # Get admin user
-                    admin_user = User.objects.filter(is_superuser=True).first()
-                    if not admin_user:
-                        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
-                
-                    # Queue the call
-                    queue_entry = CallQueue.objects.create(
-                        contact=contact,
-                        call_template=select_agent_for_purpose(campaign.campaign_type),
-                        priority=get_call_priority(contact, campaign),
-                        scheduled_time=get_optimal_call_time(contact),
-                        max_attempts=3,
-                        status='pending',
-                        created_by=admin_user,
-                        call_config={
-                            'campaign_id': str(campaign.id),
-                            'contact_name': f"{contact.first_name} {contact.last_name}",
-                            'auto_scheduled': True,
-                            'scheduler_run': timezone.now().isoformat()
-                        }
-                    )
-                    
-                    scheduled_calls += 1
-                    logger.info(f"📅 Scheduled call: {contact.first_name} {contact.last_name}")
+            contacts_to_call = [
+                contact for contact in campaign_contacts
+                if should_call_contact(contact, campaign, recently_called_ids, today_calls)
+            ]
+            if not contacts_to_call:
+                continue
+            
+            # Get admin user (once per run, not per contact)
+            if admin_user is None:
+                admin_user = User.objects.filter(is_superuser=True).first()
+                if not admin_user:
+                    admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
+            
+            call_template = select_agent_for_purpose(campaign.campaign_type)
+            scheduler_run = timezone.now().isoformat()
+            
+            new_queue_entries = [
+                CallQueue(
+                    contact=contact,
+                    call_template=call_template,
+                    campaign=campaign,
+                    priority=get_call_priority(contact, campaign),
+                    scheduled_time=call_time,
+                    max_attempts=3,
+                    status='pending',
+                    created_by=admin_user,
+                    call_config={
+                        'campaign_id': str(campaign.id),
+                        'contact_name': f"{contact.first_name} {contact.last_name}",
+                        'auto_scheduled': True,
+                        'scheduler_run': scheduler_run
+                    }
+                )
+                for contact, call_time in zip(contacts_to_call, get_optimal_call_times(contacts_to_call))
+            ]
+            
+            # Queue the calls in batched INSERTs
+            with transaction.atomic():
+                CallQueue.objects.bulk_create(new_queue_entries, batch_size=500)
+            
+            scheduled_calls += len(new_queue_entries)
+            logger.info(f"📅 Scheduled {len(new_queue_entries)} calls for campaign: {campaign.name}")
+        
+        # bulk_create bypasses post_save, so drop the next-due marker by hand
+        if scheduled_calls:
+            queue_marker.invalidate()
         
         logger.info(f"✅ Dynamic scheduler completed: {scheduled_calls} calls scheduled")
         return {'scheduled_calls': scheduled_calls}
@@ -704,22 +990,45 @@ def get_contacts_for_campaign(campaign):
             contact_type='customer'
         )
     
-    # Exclude contacts already in this campaign
-    existing_campaign_contacts = CampaignContact.objects.filter(
-        campaign=campaign
-    ).values_list('contact_id', flat=True)
-    
-    contacts = contacts.exclude(id__in=existing_campaign_contacts)
+    # Exclude contacts already in this campaign (correlated NOT EXISTS, so
+    # the planner can use an anti-join on the (campaign, contact) unique index)
+    contacts = contacts.filter(
+        ~Exists(CampaignContact.objects.filter(campaign=campaign, contact_id=OuterRef('pk')))
+    )
     
     # Limit based on campaign settings
     max_contacts = getattr(campaign, 'max_contacts_per_day', 50)
     return contacts[:max_contacts]
 
 
-def should_call_contact(contact, campaign):
-    """Determine if we should call this contact now"""
+def get_recently_called_contact_ids(contact_ids):
+    """IDs (of ``contact_ids``) that already received a call in the last 24 hours"""
     
-    current_time = timezone.now()
+    return set(
+        Call.objects.filter(
+            contact_id__in=contact_ids,
+            created_at__gte=timezone.now() - timedelta(days=1)
+        ).values_list('contact_id', flat=True).distinct()
+    )
+
+
+def get_campaign_calls_today(campaign):
+    """Number of calls placed for this campaign today"""
+    
+    # Range on created_at (not created_at__date) so the (campaign, created_at)
+    # index can serve the whole lookup
+    start_of_day = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    return Call.objects.filter(
+        campaign=campaign,
+        created_at__gte=start_of_day
+    ).count()
+
+
+def is_campaign_calling_window_open(campaign, current_time=None):
+    """Check the campaign's allowed calling hours and days of week"""
+    
+    current_time = current_time or timezone.now()
     
     # Check calling hours
     if campaign.allowed_calling_hours_start and campaign.allowed_calling_hours_end:
@@ -736,21 +1045,30 @@ def should_call_contact(contact, campaign):
         if current_weekday not in campaign.allowed_days_of_week:
             return False
     
-    # Check if contact was called recently
-    recent_calls = Call.objects.filter(
-        contact=contact,
-        created_at__gte=timezone.now() - timedelta(days=1)
-    ).count()
+    return True
+
+
+def should_call_contact(contact, campaign, recently_called_ids, today_calls):
+    """
+    Determine if we should call this contact now
     
-    if recent_calls > 0:
-        return False  # Don't call same contact twice in a day
+    The calling window is contact-independent; callers check it once per
+    campaign with is_campaign_calling_window_open.
     
-    # Check campaign rate limits
-    today_calls = Call.objects.filter(
-        created_at__date=timezone.now().date(),
-        call_metadata__campaign_id=str(campaign.id)
-    ).count()
+    Args:
+        contact: Contact to check
+        campaign: Campaign the call belongs to
+        recently_called_ids: Contact IDs called in the last 24 hours
+            (see get_recently_called_contact_ids)
+        today_calls: Calls already placed for the campaign today
+            (see get_campaign_calls_today)
+    """
     
+    # Don't call same contact twice in a day
+    if contact.id in recently_called_ids:
+        return False
+    
+    # Check campaign rate limits
     if today_calls >= campaign.max_calls_per_day:
         return False
     
@@ -777,30 +1095,21 @@ def get_call_priority(contact, campaign):
     return priority
 
 
-def get_optimal_call_time(contact):
-    """Determine the best time to call this contact"""
-    
-    current_time = timezone.now()
+def _preferred_call_hour(contact):
+    """Hour of day matching the contact's time-of-day preference"""
     
-    # Check contact preferences
-    if hasattr(contact, 'ai_interaction_history') and contact.ai_interaction_history:
+    preferred_time = None
+    if contact.ai_interaction_history:
         preferred_time = contact.ai_interaction_history.get('preferred_time')
-        
-        if preferred_time == 'morning':
-            # Schedule for 9-11 AM
-            call_time = current_time.replace(hour=9, minute=0, second=0)
-        elif preferred_time == 'afternoon':
-            # Schedule for 2-4 PM
-            call_time = current_time.replace(hour=14, minute=0, second=0)
-        elif preferred_time == 'evening':
-            # Schedule for 6-7 PM
-            call_time = current_time.replace(hour=18, minute=0, second=0)
-        else:
-            # Default to 10 AM
-            call_time = current_time.replace(hour=10, minute=0, second=0)
-    else:
-        # Default to 10 AM
-        call_time = current_time.replace(hour=10, minute=0, second=0)
+    
+    # Default to 10 AM when there is no (known) preference
+    return PREFERRED_CALL_HOURS.get(preferred_time, DEFAULT_CALL_HOUR)
+
+
+def _next_call_time_at(hour, current_time):
+    """Next occurrence of ``hour``:00 - today if still ahead, else tomorrow"""
+    
+    call_time = current_time.replace(hour=hour, minute=0, second=0, microsecond=0)
     
     # If time has passed today, schedule for tomorrow
     if call_time <= current_time:
@@ -809,8 +1118,50 @@ def get_optimal_call_time(contact):
     return call_time
 
 
+def get_optimal_call_time(contact):
+    """Determine the best time to call this contact"""
+    
+    return _next_call_time_at(_preferred_call_hour(contact), timezone.now())
+
+
+def get_optimal_call_times(contacts):
+    """
+    Determine the best call time for many contacts at once
+    
+    Every contact is resolved against the same reference time, and the
+    replace/compare/roll-over work runs once per distinct preferred hour
+    rather than once per contact.
+    
+    Returns:
+        list: Call times in the same order as ``contacts``
+    """
+    current_time = timezone.now()
+    call_times = {
+        hour: _next_call_time_at(hour, current_time)
+        for hour in {*PREFERRED_CALL_HOURS.values(), DEFAULT_CALL_HOUR}
+    }
+    
+    return [call_times[_preferred_call_hour(contact)] for contact in contacts]
+
+
+def _record_dispatched_task_ids(dispatched_entries):
+    """
+    Store each dispatched entry's Celery task ID in its task_id column
+    
+    A plain indexed column: one CASE WHEN UPDATE for the batch, without
+    re-serializing call_config.
+    
+    Args:
+        dispatched_entries: (queue_id, task_id) tuples
+    """
+    CallQueue.objects.bulk_update(
+        [CallQueue(id=queue_id, task_id=task_id) for queue_id, task_id in dispatched_entries],
+        ['task_id']
+    )
+
+
 @shared_task(bind=True)
-def process_call_queue(self):
+def process_call_queue(self, batch_size=None):
     """
     Process pending calls in the queue
     
@@ -818,60 +1169,135 @@ def process_call_queue(self):
     1. Finds calls that are ready to be made
     2. Initiates the autonomous agent call
     3. Updates queue status
+    
+    Args:
+        batch_size: Maximum entries claimed per run (defaults to CALL_QUEUE_BATCH_SIZE)
     """
     try:
         logger.info("📞 Processing call queue...")
         
+        batch_size = batch_size or getattr(settings, 'CALL_QUEUE_BATCH_SIZE', 100)
+        
         # Get pending calls that are ready
         current_time = timezone.now()
-        from django.db import models
         
-        ready_calls = CallQueue.objects.filter(
-            status='pending',
-            scheduled_time__lte=current_time,
-            attempt_count__lt=models.F('max_attempts')
-        ).order_by('priority', 'scheduled_time')
+        # Skip the SELECT entirely on idle ticks
+        if queue_marker.is_queue_idle(current_time):
+            return {'processed_calls': 0}
+        
+        # Claim the batch atomically: rows locked by another worker are
+        # skipped, so concurrent runs never dispatch the same entry twice
+        with transaction.atomic():
+            # Plain dict rows: the dispatcher only forwards a few columns,
+            # so skip model instantiation for CallQueue/Contact. Template
+            # fields come from the per-process template cache instead of a join
+            ready_calls = list(
+                CallQueue.objects
+                .select_for_update(skip_locked=True, of=('self',))
+                .filter(
+                    status='pending',
+                    scheduled_time__lte=current_time,
+                    attempt_count__lt=F('max_attempts')
+                )
+                .order_by('priority_rank', 'scheduled_time')
+                .values(
+                    'id', 'contact_id', 'contact__phone_number',
+                    'call_template_id',
+                    'call_config', 'attempt_count'
+                )[:batch_size]
+            )
+            
+            claimed_ids = [queue_entry['id'] for queue_entry in ready_calls]
+            if claimed_ids:
+                CallQueue.objects.filter(id__in=claimed_ids).update(
+                    status='in_progress',
+                    attempt_count=F('attempt_count') + 1,
+                    task_id=None,
+                    updated_at=current_time
+                )
+        
+        # Campaign batches usually share a handful of templates across many
+        # entries; after warm-up these resolve without touching the database
+        template_version = template_cache.current_version()
         
         processed_calls = 0
+        dispatched_entries = []
+        failed_entries = []
+        unsent_entries = []
         
-        for queue_entry in ready_calls[:10]:  # Process max 10 calls at once
-            try:
-                # Get agent name from template
-                agent_name = 'AI Agent'
-                if queue_entry.call_template and queue_entry.call_template.conversation_flow:
-                    agent_name = queue_entry.call_template.conversation_flow.get('agent_name', 'AI Agent')
-                
-                logger.info(f"🤖 {agent_name} making call to {queue_entry.contact.phone_number}")
-                
-                # Update queue entry
-                queue_entry.status = 'in_progress'
-                queue_entry.attempt_count += 1
-                queue_entry.save()
-                
-                # Make the call
-                result = autonomous_agent_call.delay(
-                    contact_id=str(queue_entry.contact.id),
-                    call_purpose=queue_entry.call_template.template_type if queue_entry.call_template else 'sales',
-                    context_data={
-                        'queue_id': str(queue_entry.id),
-                        'agent_name': agent_name,
-                        'template_id': str(queue_entry.call_template.id) if queue_entry.call_template else None
-                    }
-                )
-                
-                # Update with task ID
-                queue_entry.call_config['task_id'] = result.id
-                queue_entry.save()
-                
-                processed_calls += 1
-                
-            except Exception as e:
-                logger.error(f"❌ Failed to process queue entry {queue_entry.id}: {str(e)}")
-                queue_entry.status = 'failed'
-                queue_entry.call_config['error'] = str(e)
-                queue_entry.save()
+        # Publish the whole batch over one pooled broker connection/channel
+        # instead of acquiring a producer per .delay() call
+        with autonomous_agent_call.app.producer_pool.acquire(block=True) as producer:
+            for index, queue_entry in enumerate(ready_calls):
+                queue_id, contact_id, phone_number, template_id, call_config = _queue_row_fields(queue_entry)
+                try:
+                    # Get agent name and purpose from template
+                    if template_id:
+                        agent_name, call_purpose = template_cache.get_template_info(template_id, template_version)
+                    else:
+                        agent_name, call_purpose = 'AI Agent', 'sales'
+                    
+                    # %-style args defer formatting until a handler accepts the record
+                    logger.info("🤖 %s making call to %s", agent_name, phone_number)
+                    
+                    # Make the call
+                    result = autonomous_agent_call.apply_async(
+                        # UUIDs go through kombu's JSON encoder as-is
+                        kwargs={
+                            'contact_id': contact_id,
+                            'call_purpose': call_purpose,
+                            'context_data': {
+                                'queue_id': queue_id,
+                                'agent_name': agent_name,
+                                'template_id': template_id
+                            }
+                        },
+                        producer=producer
+                    )
+                    
+                    # Record the task ID; written back in bulk after dispatch
+                    dispatched_entries.append((queue_id, result.id))
+                    
+                    processed_calls += 1
+                    
+                except (BrokerOperationalError, ConnectionError) as e:
+                    # The broker is unreachable, so nothing else in this batch can
+                    # be published either: hand the rest back untouched
+                    logger.error(f"❌ Broker unavailable while dispatching queue entry {queue_id}: {str(e)}")
+                    unsent_entries = ready_calls[index:]
+                    break
+                    
+                except Exception as e:
+                    logger.error(f"❌ Failed to process queue entry {queue_id}: {str(e)}")
+                    call_config['error'] = str(e)
+                    failed_entries.append(CallQueue(id=queue_id, status='failed', call_config=call_config))
+            
+        if dispatched_entries:
+            _record_dispatched_task_ids(dispatched_entries)
+        if failed_entries:
+            CallQueue.objects.bulk_update(failed_entries, ['status', 'call_config'])
+        if unsent_entries:
+            # Undo the claim: back to pending without spending an attempt
+            CallQueue.objects.filter(id__in=[queue_entry['id'] for queue_entry in unsent_entries]).update(
+                status='pending',
+                attempt_count=F('attempt_count') - 1,
+                updated_at=timezone.now()
+            )
+            logger.warning(f"⚠️ Returned {len(unsent_entries)} queue entries to pending after a broker error")
         
         logger.info(f"✅ Call queue processed: {processed_calls} calls initiated")
+        
+        # A full batch means more entries are probably due; drain them now
+        # rather than waiting for the next beat tick (unless the broker is down)
+        if len(ready_calls) == batch_size and not unsent_entries:
+            process_call_queue.apply_async(kwargs={'batch_size': batch_size}, countdown=0)
+        else:
+            next_due = CallQueue.objects.filter(
+                status='pending',
+                attempt_count__lt=F('max_attempts')
+            ).aggregate(next_due=Min('scheduled_time'))['next_due']
+            queue_marker.set_next_due(next_due)
+        
         return {'processed_calls': processed_calls}
         
     except Exception as e:
@@ -879,14 +1305,89 @@ def process_call_queue(self):
         raise
 
 
-import logging
-from typing import Dict, List, Any, Optional
-from django.db.models import Q
-from ai_integration.models import AIConversation, AIMessage
-from ai_integration.training_models import AgentKnowledgeBase
-from ai_integration.training_services import process_conversation_for_training_task
+@shared_task
+def reap_stale_queue_claims():
+    """
+    Return claimed queue entries that were never published to pending
+    
+    The dispatchers commit their claim before publishing and record the task
+    id afterwards, so a crash in between leaves an entry in_progress with no
+    task_id and nothing working on it. Run from beat (e.g. every 5 minutes);
+    the attempt was never made, so it is given back.
+    """
+    reaped = CallQueue.objects.filter(
+        status='in_progress',
+        task_id__isnull=True,
+        updated_at__lt=timezone.now() - STALE_CLAIM_TIMEOUT
+    ).update(
+        status='pending',
+        attempt_count=F('attempt_count') - 1,
+        updated_at=timezone.now()
+    )
+    
+    if reaped:
+        # The UPDATE bypasses post_save; wake the dispatcher for these entries
+        queue_marker.invalidate()
+        logger.warning(f"⚠️ Returned {reaped} unpublished queue claims to pending")
+    
+    return {'status': 'success', 'reaped_entries': reaped}
+
+
+@shared_task
+def flush_kb_usage_counters():
+    """
+    Write buffered knowledge usage increments to AgentKnowledgeBase
+
+    Run from beat (e.g. every 60 seconds). Entries with the same pending
+    increment share one UPDATE, so a flush costs a handful of statements
+    regardless of how many responses were generated since the last one.
+    """
+    increments = kb_usage.drain_usage()
+    if not increments:
+        return {'status': 'success', 'updated_entries': 0}
+    
+    ids_by_increment = {}
+    for knowledge_id, increment in increments.items():
+        ids_by_increment.setdefault(increment, []).append(knowledge_id)
+    
+    try:
+        with transaction.atomic():
+            for increment, knowledge_ids in ids_by_increment.items():
+                AgentKnowledgeBase.objects.filter(pk__in=knowledge_ids).update(
+                    usage_count=F('usage_count') + increment
+                )
+    except Exception as e:
+        logger.error(f"❌ Failed to flush knowledge usage counters: {str(e)}")
+        kb_usage.restore_usage(increments)
+        raise
+    
+    logger.info(f"📊 Flushed usage counters for {len(increments)} knowledge entries")
+    return {'status': 'success', 'updated_entries': len(increments)}
+
+
+# Knowledge sections memoized per worker process, one per knowledge base
+# version and time window; the window bounds staleness from usage_count
+# re-ranking, which doesn't touch updated_at
+KNOWLEDGE_SECTION_WINDOW = 300
+KNOWLEDGE_SECTION_MEMO_SIZE = 128
+
+# Knowledge search results remembered per agent (i.e. per conversation)
+KNOWLEDGE_SEARCH_CACHE_SIZE = 32
+
+# Words in a caller's message that carry no intent; dropped before the
+# knowledge search so the OR'd query and the ?| array stay small
+KNOWLEDGE_STOP_WORDS = frozenset({
+    'about', 'also', 'and', 'are', 'but', 'can', 'could', 'did', 'does', 'for',
+    'from', 'had', 'has', 'have', 'her', 'him', 'his', 'how', 'just', 'like',
+    'not', 'now', 'our', 'she', 'that', 'the', 'their', 'them', 'then', 'there',
+    'they', 'this', 'was', 'were', 'what', 'when', 'where', 'which', 'who', 'why',
+    'will', 'with', 'would', 'yes', 'you', 'your',
+})
+MAX_KNOWLEDGE_SEARCH_TERMS = 10
+
+# The only AgentKnowledgeBase columns the prompt builders read
+KNOWLEDGE_PROMPT_FIELDS = ('title', 'knowledge_type', 'content', 'context', 'success_rate')
 
-logger = logging.getLogger(__name__)
 
 class EnhancedAutonomousAgent:
     """
@@ -898,6 +1399,9 @@ class EnhancedAutonomousAgent:
         self.agent_config = agent_config
         self.logger = logging.getLogger(__name__)
         
+        # Keyword searches already run in this conversation, most recent last
+        self._knowledge_search_cache = OrderedDict()
+        
         # Enhanced system prompt with learning capabilities
         self.system_prompt = self._build_enhanced_system_prompt()
     
@@ -905,55 +1409,127 @@ class EnhancedAutonomousAgent:
         """Build system prompt enhanced with learned knowledge"""
         base_prompt = self.agent_config.get('system_prompt', DEFAULT_SYSTEM_PROMPT)
         
-        # Get relevant knowledge from knowledge base
-        knowledge_entries = self._get_relevant_knowledge()
-        
-        if knowledge_entries:
-            knowledge_section = "\n\n=== LEARNED KNOWLEDGE ===\n"
-            for entry in knowledge_entries:
-                knowledge_section += f"\n**{entry.title}** ({entry.knowledge_type}):\n"
-                knowledge_section += f"{entry.content}\n"
-                if entry.context:
-                    knowledge_section += f"Context: {entry.context}\n"
-                knowledge_section += f"Success Rate: {entry.success_rate:.2%}\n"
-                knowledge_section += "---\n"
-            
-            enhanced_prompt = base_prompt + knowledge_section
+        # The knowledge section is the same for every agent instance until an
+        # entry is saved, added or deleted, so it is rendered once per version
+        # and then served from process memory
+        version = self._get_knowledge_version()
+        if version is None:
+            knowledge_section, knowledge_ids = self._build_knowledge_section()
         else:
-            enhanced_prompt = base_prompt
+            window = int(time.time() // KNOWLEDGE_SECTION_WINDOW)
+            knowledge_section, knowledge_ids = self._memoized_knowledge_section(version, window)
         
-        return enhanced_prompt
+        # Entries already in the system prompt aren't repeated per message
+        self._prompt_knowledge_ids = knowledge_ids
+        
+        return base_prompt + knowledge_section
+    
+    @staticmethod
+    @lru_cache(maxsize=KNOWLEDGE_SECTION_MEMO_SIZE)
+    def _memoized_knowledge_section(version: str, window: int) -> tuple:
+        """Knowledge section (and its entry ids) for a knowledge base version, kept in process memory"""
+        return EnhancedAutonomousAgent._build_knowledge_section()
     
-    def _get_relevant_knowledge(self, limit: int = 10) -> List[AgentKnowledgeBase]:
+    def _get_knowledge_version(self) -> Optional[str]:
+        """Cheap fingerprint of the knowledge base: latest update plus row count"""
+        try:
+            stats = AgentKnowledgeBase.objects.order_by().aggregate(
+                latest=Max('updated_at'), total=Count('pk')
+            )
+        except Exception as e:
+            self.logger.error(f"Error reading knowledge version: {str(e)}")
+            return None
+        
+        if stats['latest'] is None:
+            return 'empty'
+        return f"{stats['latest'].timestamp()}:{stats['total']}"
+    
+    @staticmethod
+    def _build_knowledge_section() -> tuple:
+        """Query and render the LEARNED KNOWLEDGE section; returns (section, entry ids)"""
+        knowledge_entries = EnhancedAutonomousAgent._get_relevant_knowledge()
+        knowledge_ids = frozenset(entry.pk for entry in knowledge_entries)
+        return EnhancedAutonomousAgent._render_knowledge_section(knowledge_entries), knowledge_ids
+    
+    @staticmethod
+    def _render_knowledge_section(knowledge_entries: List[AgentKnowledgeBase]) -> str:
+        """Render the LEARNED KNOWLEDGE section appended to the system prompt"""
+        if not knowledge_entries:
+            return ''
+        
+        parts = ["\n\n=== LEARNED KNOWLEDGE ===\n"]
+        for entry in knowledge_entries:
+            parts.append(f"\n**{entry.title}** ({entry.knowledge_type}):\n{entry.content}\n")
+            if entry.context:
+                parts.append(f"Context: {entry.context}\n")
+            parts.append(f"Success Rate: {entry.success_rate:.2%}\n---\n")
+        return ''.join(parts)
+    
+    @staticmethod
+    def _get_relevant_knowledge(limit: int = 10) -> List[AgentKnowledgeBase]:
         """Get relevant knowledge entries for this agent"""
         try:
             # Get high-performing knowledge entries
             knowledge = AgentKnowledgeBase.objects.filter(
                 is_active=True,
                 success_rate__gte=0.6  # Only include successful patterns
-            ).order_by('-success_rate', '-usage_count')[:limit]
+            ).only(*KNOWLEDGE_PROMPT_FIELDS).order_by('-success_rate', '-usage_count')[:limit]
             
             return list(knowledge)
             
         except Exception as e:
-            self.logger.error(f"Error retrieving knowledge: {str(e)}")
+            logger.error(f"Error retrieving knowledge: {str(e)}")
             return []
     
     def search_knowledge_by_intent(self, user_message: str) -> List[AgentKnowledgeBase]:
         """Search knowledge base for relevant entries based on user message"""
         try:
-            # Extract potential intents/keywords from user message
+            # Extract potential intents/keywords from user message: deduped,
+            # punctuation stripped, stop words dropped, capped
             message_lower = user_message.lower()
+            words = [
+                word for word in dict.fromkeys(re.findall(r"[a-z0-9']+", message_lower))
+                if len(word) >= 3 and word not in KNOWLEDGE_STOP_WORDS
+            ][:MAX_KNOWLEDGE_SEARCH_TERMS]
+            if not words:
+                return []
+            
+            # Later turns often repeat the same keywords; reuse this
+            # conversation's earlier result instead of querying again
+            search_key = tuple(words) if connection.vendor == 'postgresql' else message_lower[:50]
+            if search_key in self._knowledge_search_cache:
+                self._knowledge_search_cache.move_to_end(search_key)
+                return self._knowledge_search_cache[search_key]
+            
+            active_knowledge = AgentKnowledgeBase.objects.filter(is_active=True).only(*KNOWLEDGE_PROMPT_FIELDS)
+            
+            if connection.vendor == 'postgresql':
+                # Any word may match: OR the per-word queries so a long message
+                # doesn't turn into an all-words-required tsquery. The @@ match is
+                # served by the GIN index on search_vector.
+                search_query = SearchQuery(words[0], config='english')
+                for word in words[1:]:
+                    search_query |= SearchQuery(word, config='english')
+                
+                knowledge_matches = active_knowledge.annotate(
+                    rank=SearchRank(F('search_vector'), search_query)
+                ).filter(
+                    Q(search_vector=search_query) |
+                    Q(trigger_phrases__has_any_keys=words)  # jsonb ?|, GIN-indexed
+                ).order_by('-rank', '-success_rate')[:5]
+            else:
+                # search_vector is only maintained on PostgreSQL
+                knowledge_matches = active_knowledge.filter(
+                    Q(content__icontains=message_lower[:50]) |  # First 50 chars
+                    Q(title__icontains=message_lower[:30])      # First 30 chars
+                ).order_by('-success_rate')[:5]
             
-            # Search in knowledge base
-            knowledge_matches = AgentKnowledgeBase.objects.filter(
-                Q(trigger_phrases__overlap=[word for word in message_lower.split()]) |
-                Q(content__icontains=message_lower[:50]) |  # First 50 chars
-                Q(title__icontains=message_lower[:30]),     # First 30 chars
-                is_active=True
-            ).order_by('-success_rate')[:5]
+            knowledge_matches = list(knowledge_matches)
+            self._knowledge_search_cache[search_key] = knowledge_matches
+            if len(self._knowledge_search_cache) > KNOWLEDGE_SEARCH_CACHE_SIZE:
+                self._knowledge_search_cache.popitem(last=False)
             
-            return list(knowledge_matches)
+            return knowledge_matches
             
         except Exception as e:
             self.logger.error(f"Error searching knowledge: {str(e)}")
@@ -962,19 +1538,28 @@ class EnhancedAutonomousAgent:
     def generate_enhanced_response(self, user_message: str, conversation_context: List[Dict], contact_info: Dict) -> str:
         """Generate response using learned knowledge"""
         try:
-            # Get relevant knowledge for this specific message
+            # Get relevant knowledge for this specific message. This is the only
+            # I/O ahead of the completion and the prompt depends on it, so it
+            # stays inline; on eventlet workers other calls run while it waits.
             relevant_knowledge = self.search_knowledge_by_intent(user_message)
             
             # Build context-aware system prompt
-            context_prompt = self.system_prompt
+            prompt_parts = [self.system_prompt]
             
-            if relevant_knowledge:
-                context_prompt += "\n\n=== RELEVANT LEARNED RESPONSES ===\n"
-                for knowledge in relevant_knowledge:
-                    context_prompt += f"\n**For similar situations**: {knowledge.content}\n"
+            # Entries from the LEARNED KNOWLEDGE section are already in the prompt
+            new_knowledge = [
+                knowledge for knowledge in relevant_knowledge
+                if knowledge.pk not in self._prompt_knowledge_ids
+            ]
+            if new_knowledge:
+                prompt_parts.append("\n\n=== RELEVANT LEARNED RESPONSES ===\n")
+                for knowledge in new_knowledge:
+                    prompt_parts.append(f"\n**For similar situations**: {knowledge.content}\n")
                     if knowledge.context:
-                        context_prompt += f"**When to use**: {knowledge.context}\n"
-                    context_prompt += f"**Success rate**: {knowledge.success_rate:.2%}\n---\n"
+                        prompt_parts.append(f"**When to use**: {knowledge.context}\n")
+                    prompt_parts.append(f"**Success rate**: {knowledge.success_rate:.2%}\n---\n")
+            
+            context_prompt = ''.join(prompt_parts)
             
             # Build messages for OpenAI
             messages = [
@@ -993,13 +1578,18 @@ class EnhancedAutonomousAgent:
             
             assistant_message = response.choices[0].message.content
             
-            # Record knowledge usage if relevant knowledge was used
-            for knowledge in relevant_knowledge:
-                try:
-                    knowledge.usage_count += 1
-                    knowledge.save(update_fields=['usage_count'])
-                except Exception as e:
-                    self.logger.warning(f"Failed to update knowledge usage: {str(e)}")
+            # Record knowledge usage if relevant knowledge was used. Increments
+            # are buffered in Redis and written by flush_kb_usage_counters; only
+            # if Redis is down do they go straight to the database.
+            if relevant_knowledge:
+                knowledge_ids = [knowledge.pk for knowledge in relevant_knowledge]
+                if not kb_usage.record_usage(knowledge_ids):
+                    try:
+                        AgentKnowledgeBase.objects.filter(pk__in=knowledge_ids).update(
+                            usage_count=F('usage_count') + 1
+                        )
+                    except Exception as e:
+                        self.logger.warning(f"Failed to update knowledge usage: {str(e)}")
             
             return assistant_message
             
@@ -1032,6 +1622,10 @@ class EnhancedAutonomousAgent:
     
     def learn_from_conversation(self, ai_conversation: AIConversation, call=None, success_feedback: Optional[bool] = None):
         """Trigger learning from a completed conversation"""
+        # Deferred: the training pipeline is only needed once a conversation ends,
+        # so workers don't pay for importing it at fork time
+        from ai_integration.training_services import process_conversation_for_training_task
+        
         try:
             # Process conversation for training in background
             process_conversation_for_training_task.delay(
@@ -1050,36 +1644,3 @@ class EnhancedAutonomousAgent:
             
         except Exception as e:
             self.logger.error(f"Error initiating learning: {str(e)}")
-
-
-# Update the original make_autonomous_call function to use enhanced agent
-def make_autonomous_call_with_learning(phone_number: str, agent_config: Dict[str, Any], 
-                                     contact_data: Optional[Dict] = None) -> Dict[str, Any]:
-    """
-    Enhanced autonomous call with learning capabilities
-    """
-    try:
-        # ... (existing call setup code) ...
-        
-        # Use enhanced agent instead of basic agent
-        enhanced_agent = EnhancedAutonomousAgent(openai_client, agent_config)
-        
-        # ... (rest of the call logic using enhanced_agent) ...
-        
-        # After call completion, trigger learning
-        if ai_conversation:
-            enhanced_agent.learn_from_conversation(ai_conversation, call_record)
-        
-        return {
-            'success': True,
-            'call_id': str(call_record.id) if call_record else None,
-            'conversation_id': str(ai_conversation.id) if ai_conversation else None,
-            'message': 'Enhanced autonomous call completed with learning'
-        }
-        
-    except Exception as e:
-        logger.error(f"Error in enhanced autonomous call: {str(e)}")
-        return {
-            'success': False,
-            'error': str(e)
-        }
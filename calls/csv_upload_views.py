@@ -3,24 +3,48 @@ CSV Upload Management for Outbound Calls
 Handles bulk contact import and knowledge base integration
 """
 import csv
-import pandas as pd
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.contrib.auth.decorators import login_required
-from django.shortcuts import render
+import io
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, Q
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-import json
 import uuid
 from datetime import datetime
 
-from crm.models import Contact, ContactNote
-from calls.models import CallTemplate, CallQueue
+from calls.models import CallQueue, CsvUploadJob
+from calls.services import contact_import, queue_marker, template_cache
+from calls.tasks import process_contacts_csv_task
 from scheduling.models import Campaign, CampaignContact
 from ai_integration.models import AIPromptTemplate
-from django.contrib.auth.models import User
+
+# System prompt for knowledge base templates; filled once per CSV row
+KNOWLEDGE_SYSTEM_PROMPT_TEMPLATE = """You are an AI agent with knowledge about: {topic}
+
+Context: {context}
+
+When asked about "{question}", respond with:
+{answer}
+
+Additional Information:
+- Priority: {priority}
+- Tags: {tags}
+- Agent: {agent_name}
+
+Always be helpful, accurate, and professional in your responses."""
+
+
+def _open_csv_reader(csv_file):
+    """
+    DictReader that decodes the upload as it is read, instead of holding the
+    raw bytes and the decoded lines in memory (utf-8-sig drops an Excel BOM)
+    """
+    return csv.DictReader(io.TextIOWrapper(csv_file.file, encoding='utf-8-sig', newline=''))
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -51,27 +75,20 @@ def upload_csv_contacts(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # Read CSV file
-        decoded_file = csv_file.read().decode('utf-8').splitlines()
-        csv_reader = csv.DictReader(decoded_file)
-        
-        created_contacts = []
-        updated_contacts = []
-        errors = []
-        
         # Get campaign info from request
         campaign_name = request.data.get('campaign_name', 'CSV Upload Campaign')
         agent_preference = request.data.get('agent_preference', 'Ali Khan')  # Default agent
         call_priority = request.data.get('priority', 'normal')
         
         # Create or get campaign
+        now = datetime.now()
         campaign, created = Campaign.objects.get_or_create(
             name=campaign_name,
             defaults={
                 'campaign_type': 'bulk_calls',
                 'status': 'active',
-                'description': f'Campaign created from CSV upload - {datetime.now().strftime("%Y-%m-%d %H:%M")}',
-                'start_date': datetime.now(),
+                'description': f'Campaign created from CSV upload - {now.strftime("%Y-%m-%d %H:%M")}',
+                'start_date': now,
                 'allowed_calling_hours_start': '09:00:00',
                 'allowed_calling_hours_end': '18:00:00',
                 'allowed_days_of_week': [1, 2, 3, 4, 5],
@@ -81,111 +98,41 @@ def upload_csv_contacts(request):
             }
         )
         
-        row_number = 1
-        for row in csv_reader:
-            row_number += 1
-            
-            try:
-                # Required fields
-                first_name = row.get('first_name', '').strip()
-                last_name = row.get('last_name', '').strip()
-                phone_number = row.get('phone_number', '').strip()
-                
-                if not phone_number:
-                    errors.append(f"Row {row_number}: Phone number is required")
-                    continue
-                
-                # Ensure phone number format
-                if not phone_number.startswith('+'):
-                    phone_number = '+92' + phone_number.lstrip('0')
-                
-                # Create or update contact
-                contact, created = Contact.objects.get_or_create(
-                    phone_number=phone_number,
-                    defaults={
-                        'first_name': first_name or 'Unknown',
-                        'last_name': last_name or 'Contact',
-                        'email': row.get('email', '').strip(),
-                        'company': row.get('company', '').strip(),
-                        'job_title': row.get('job_title', '').strip(),
-                        'lead_source': row.get('lead_source', 'csv_upload'),
-                        'contact_type': 'lead',
-                        'status': 'active',
-                        'ai_interaction_history': {
-                            'preferred_time': row.get('preferred_time', 'morning'),
-                            'language': row.get('language', 'urdu'),
-                            'timezone': row.get('timezone', 'Asia/Karachi'),
-                            'custom_field_1': row.get('custom_field_1', ''),
-                            'custom_field_2': row.get('custom_field_2', ''),
-                            'csv_upload_date': datetime.now().isoformat(),
-                            'campaign_name': campaign_name
-                        }
-                    }
-                )
-                
-                if created:
-                    created_contacts.append(contact)
-                else:
-                    # Update existing contact with new info
-                    if row.get('email'):
-                        contact.email = row.get('email').strip()
-                    if row.get('company'):
-                        contact.company = row.get('company').strip()
-                    if row.get('job_title'):
-                        contact.job_title = row.get('job_title').strip()
-                    
-                    # Update AI interaction history
-                    contact.ai_interaction_history.update({
-                        'preferred_time': row.get('preferred_time', contact.ai_interaction_history.get('preferred_time', 'morning')),
-                        'language': row.get('language', contact.ai_interaction_history.get('language', 'urdu')),
-                        'last_csv_update': datetime.now().isoformat()
-                    })
-                    contact.save()
-                    updated_contacts.append(contact)
-                
-                # Add notes if provided
-                notes = row.get('notes', '').strip()
-                if notes:
-                    ContactNote.objects.create(
-                        contact=contact,
-                        title="CSV Upload Note",
-                        content=notes,
-                        created_by=request.user,
-                        note_type='general'
-                    )
-                
-                # Add to campaign
-                CampaignContact.objects.get_or_create(
-                    campaign=campaign,
-                    contact=contact,
-                    defaults={
-                        'status': 'pending',
-                        'assigned_agent': request.user,
-                        'priority': call_priority,
-                        'metadata': {
-                            'source': 'csv_upload',
-                            'agent_preference': agent_preference,
-                            'upload_timestamp': datetime.now().isoformat()
-                        }
-                    }
-                )
-                
-            except Exception as e:
-                errors.append(f"Row {row_number}: {str(e)}")
+        # The import runs in a Celery worker; the request only stores the file
+        # so its latency no longer grows with the size of the CSV
+        file_path = default_storage.save(f'csv_uploads/{uuid.uuid4()}.csv', csv_file)
+        upload_job = CsvUploadJob.objects.create(
+            campaign=campaign,
+            file_path=file_path,
+            original_filename=csv_file.name,
+            agent_preference=agent_preference,
+            call_priority=call_priority,
+            created_by=request.user
+        )
+        try:
+            process_contacts_csv_task.delay(str(upload_job.id))
+        except Exception as e:
+            # Nothing will ever pick the job up: fail it and drop the file
+            upload_job.status = 'failed'
+            upload_job.error_message = f'Could not queue import: {str(e)}'
+            upload_job.completed_at = timezone.now()
+            upload_job.save(update_fields=['status', 'error_message', 'completed_at', 'updated_at'])
+            default_storage.delete(file_path)
+            raise
         
         return Response({
             'success': True,
-            'message': 'CSV upload completed',
+            'message': 'CSV upload queued for processing',
             'data': {
+                'upload_id': str(upload_job.id),
+                'status': upload_job.status,
+                'status_url': request.build_absolute_uri(
+                    reverse('calls:csv_upload:upload_status', args=[upload_job.id])
+                ),
                 'campaign_id': str(campaign.id),
-                'campaign_name': campaign.name,
-                'created_contacts': len(created_contacts),
-                'updated_contacts': len(updated_contacts),
-                'total_processed': len(created_contacts) + len(updated_contacts),
-                'errors': errors,
-                'error_count': len(errors)
+                'campaign_name': campaign.name
             }
-        }, status=status.HTTP_201_CREATED)
+        }, status=status.HTTP_202_ACCEPTED)
         
     except Exception as e:
         return Response({
@@ -216,11 +163,15 @@ def create_knowledge_base_from_csv(request):
     
     try:
         # Read CSV file
-        decoded_file = csv_file.read().decode('utf-8').splitlines()
-        csv_reader = csv.DictReader(decoded_file)
+        csv_reader = _open_csv_reader(csv_file)
         
-        created_templates = []
+        # Only the first MAX_REPORTED_ERRORS problems are listed
         errors = []
+        error_count = 0
+        
+        # get_or_create by name, for the whole file at once: first row wins for
+        # a repeated topic, and names that already exist are left untouched
+        new_templates = {}
         
         row_number = 1
         for row in csv_reader:
@@ -233,57 +184,62 @@ def create_knowledge_base_from_csv(request):
                 category = row.get('category', 'general').strip()
                 
                 if not topic or not answer:
-                    errors.append(f"Row {row_number}: Topic and Answer are required")
+                    error_count += 1
+                    if len(errors) < contact_import.MAX_REPORTED_ERRORS:
+                        errors.append(f"Row {row_number}: Topic and Answer are required")
                     continue
                 
                 # Create AI prompt template
                 template_name = f"Knowledge Base: {topic}"
+                if template_name in new_templates:
+                    continue
                 
-                prompt_template, created = AIPromptTemplate.objects.get_or_create(
+                new_templates[template_name] = AIPromptTemplate(
                     name=template_name,
-                    defaults={
+                    category=category,
+                    description=f"Knowledge base entry for {topic}",
+                    system_prompt=KNOWLEDGE_SYSTEM_PROMPT_TEMPLATE.format_map({
+                        'topic': topic,
+                        'context': row.get('context', ''),
+                        'question': question or topic,
+                        'answer': answer,
+                        'priority': row.get('priority', 'normal'),
+                        'tags': row.get('tags', ''),
+                        'agent_name': row.get('agent_name', 'Any Agent')
+                    }),
+                    initial_message=f"I can help you with information about {topic}.",
+                    ai_parameters={
+                        'temperature': 0.3,  # More consistent for knowledge base
+                        'max_tokens': 1000,
+                        'topic': topic,
                         'category': category,
-                        'description': f"Knowledge base entry for {topic}",
-                        'system_prompt': f"""
-You are an AI agent with knowledge about: {topic}
-
-Context: {row.get('context', '')}
-
-When asked about "{question or topic}", respond with:
-{answer}
-
-Additional Information:
-- Priority: {row.get('priority', 'normal')}
-- Tags: {row.get('tags', '')}
-- Agent: {row.get('agent_name', 'Any Agent')}
-
-Always be helpful, accurate, and professional in your responses.
-                        """.strip(),
-                        'initial_message': f"I can help you with information about {topic}.",
-                        'ai_parameters': {
-                            'temperature': 0.3,  # More consistent for knowledge base
-                            'max_tokens': 1000,
-                            'topic': topic,
-                            'category': category,
-                            'priority': row.get('priority', 'normal'),
-                            'tags': row.get('tags', '').split(','),
-                            'agent_preference': row.get('agent_name', 'any'),
-                            'effective_date': row.get('effective_date', ''),
-                            'expiry_date': row.get('expiry_date', '')
-                        },
-                        'template_variables': [
-                            'topic', 'question', 'answer', 'context'
-                        ],
-                        'created_by': request.user,
-                        'is_active': True
-                    }
+                        'priority': row.get('priority', 'normal'),
+                        'tags': row.get('tags', '').split(','),
+                        'agent_preference': row.get('agent_name', 'any'),
+                        'effective_date': row.get('effective_date', ''),
+                        'expiry_date': row.get('expiry_date', '')
+                    },
+                    template_variables=[
+                        'topic', 'question', 'answer', 'context'
+                    ],
+                    created_by=request.user,
+                    is_active=True
                 )
                 
-                if created:
-                    created_templates.append(template_name)
-                
             except Exception as e:
-                errors.append(f"Row {row_number}: {str(e)}")
+                error_count += 1
+                if len(errors) < contact_import.MAX_REPORTED_ERRORS:
+                    errors.append(f"Row {row_number}: {str(e)}")
+        
+        # One transaction for the whole file instead of a commit per row
+        with transaction.atomic():
+            existing_names = set(
+                AIPromptTemplate.objects.filter(name__in=list(new_templates)).values_list('name', flat=True)
+            )
+            created_templates = [name for name in new_templates if name not in existing_names]
+            AIPromptTemplate.objects.bulk_create(
+                [new_templates[name] for name in created_templates], batch_size=200
+            )
         
         return Response({
             'success': True,
@@ -292,7 +248,7 @@ Always be helpful, accurate, and professional in your responses.
                 'created_templates': len(created_templates),
                 'template_names': created_templates,
                 'errors': errors,
-                'error_count': len(errors)
+                'error_count': error_count
             }
         }, status=status.HTTP_201_CREATED)
         
@@ -316,54 +272,69 @@ def queue_calls_from_campaign(request, campaign_id):
         # Get agent preference
         agent_name = request.data.get('agent_name', 'Ali Khan')
         
-        # Find appropriate call template
-        call_template = CallTemplate.objects.filter(
-            conversation_flow__agent_name__icontains=agent_name,
-            is_active=True
-        ).first()
+        # Find appropriate call template; cached per worker until a template
+        # is saved or deleted, and only the pk is needed for the queue rows
+        call_template_id = template_cache.get_agent_template_pk(agent_name, template_cache.current_version())
         
-        if not call_template:
-            call_template = CallTemplate.objects.filter(
-                template_type='sales',
-                is_active=True
-            ).first()
+        # Get campaign contacts as plain tuples: only these columns are used,
+        # so no CampaignContact/Contact instances are built
+        campaign_contacts = list(
+            CampaignContact.objects.filter(
+                campaign=campaign,
+                status='pending'
+            ).values_list(
+                'contact_id', 'contact__first_name', 'contact__last_name',
+                'contact__phone_number', 'custom_data__priority'
+            )
+        )
         
-        # Get campaign contacts
-        campaign_contacts = CampaignContact.objects.filter(
-            campaign=campaign,
-            status='pending'
+        # Contacts that already have a pending queue entry are skipped
+        already_queued = set(
+            CallQueue.objects.filter(
+                contact_id__in=[contact_id for contact_id, *_ in campaign_contacts],
+                status='pending'
+            ).values_list('contact_id', flat=True)
         )
         
         queued_calls = []
+        queue_entries = []
+        scheduled_time = timezone.now()
         
-        for campaign_contact in campaign_contacts:
+        for contact_id, first_name, last_name, phone_number, priority in campaign_contacts:
+            if contact_id in already_queued:
+                continue
+            
+            contact_name = f"{first_name} {last_name}"
+            
             # Create call queue entry
-            queue_entry, created = CallQueue.objects.get_or_create(
-                contact=campaign_contact.contact,
+            queue_entries.append(CallQueue(
+                contact_id=contact_id,
                 status='pending',
-                defaults={
-                    'call_template': call_template,
-                    'priority': campaign_contact.priority,
-                    'max_attempts': 3,
-                    'scheduled_time': datetime.now(),
-                    'created_by': request.user,
-                    'call_config': {
-                        'campaign_id': str(campaign.id),
-                        'campaign_name': campaign.name,
-                        'agent_name': agent_name,
-                        'contact_name': f"{campaign_contact.contact.first_name} {campaign_contact.contact.last_name}",
-                        'knowledge_base_enabled': True,
-                        'csv_source': True
-                    }
+                call_template_id=call_template_id,
+                campaign=campaign,
+                priority=priority or 'normal',
+                max_attempts=3,
+                scheduled_time=scheduled_time,
+                created_by=request.user,
+                call_config={
+                    'campaign_id': str(campaign.id),
+                    'campaign_name': campaign.name,
+                    'agent_name': agent_name,
+                    'contact_name': contact_name,
+                    'knowledge_base_enabled': True,
+                    'csv_source': True
                 }
-            )
-            
-            if created:
-                queued_calls.append({
-                    'contact_name': f"{campaign_contact.contact.first_name} {campaign_contact.contact.last_name}",
-                    'phone_number': campaign_contact.contact.phone_number,
-                    'agent_name': agent_name
-                })
+            ))
+            queued_calls.append({
+                'contact_name': contact_name,
+                'phone_number': phone_number,
+                'agent_name': agent_name
+            })
+        
+        CallQueue.objects.bulk_create(queue_entries, batch_size=500)
+        if queue_entries:
+            # bulk_create skips post_save, so wake the dispatcher explicitly
+            queue_marker.invalidate()
         
         return Response({
             'success': True,
@@ -399,17 +370,24 @@ def get_campaign_status(request, campaign_id):
     try:
         campaign = Campaign.objects.get(id=campaign_id)
         
-        # Get campaign contacts
-        total_contacts = CampaignContact.objects.filter(campaign=campaign).count()
-        pending_contacts = CampaignContact.objects.filter(campaign=campaign, status='pending').count()
-        completed_contacts = CampaignContact.objects.filter(campaign=campaign, status='completed').count()
+        # Get campaign contacts: all counts in one conditional aggregate
+        contact_counts = CampaignContact.objects.filter(campaign=campaign).aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='pending')),
+            completed=Count('id', filter=Q(status='completed'))
+        )
         
-        # Get queue status
-        queued_calls = CallQueue.objects.filter(call_config__campaign_id=str(campaign.id))
-        pending_calls = queued_calls.filter(status='pending').count()
-        in_progress_calls = queued_calls.filter(status='in_progress').count()
-        completed_calls = queued_calls.filter(status='completed').count()
-        failed_calls = queued_calls.filter(status='failed').count()
+        # Get queue status, likewise in one query over the indexed campaign FK
+        call_counts = CallQueue.objects.filter(campaign=campaign).aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='pending')),
+            in_progress=Count('id', filter=Q(status='in_progress')),
+            completed=Count('id', filter=Q(status='completed')),
+            failed=Count('id', filter=Q(status='failed'))
+        )
+        total_contacts = contact_counts['total']
+        completed_calls = call_counts['completed']
+        failed_calls = call_counts['failed']
         
         return Response({
             'success': True,
@@ -424,15 +402,15 @@ def get_campaign_status(request, campaign_id):
                 },
                 'contacts': {
                     'total': total_contacts,
-                    'pending': pending_contacts,
-                    'completed': completed_contacts
+                    'pending': contact_counts['pending'],
+                    'completed': contact_counts['completed']
                 },
                 'calls': {
-                    'pending': pending_calls,
-                    'in_progress': in_progress_calls,
+                    'pending': call_counts['pending'],
+                    'in_progress': call_counts['in_progress'],
                     'completed': completed_calls,
                     'failed': failed_calls,
-                    'total_queued': queued_calls.count()
+                    'total_queued': call_counts['total']
                 },
                 'progress': {
                     'completion_rate': f"{(completed_calls / max(total_contacts, 1)) * 100:.1f}%",
@@ -451,3 +429,52 @@ def get_campaign_status(request, campaign_id):
             'success': False,
             'error': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_upload_status(request, upload_id):
+    """
+    Get status of a contacts CSV upload
+    """
+    
+    try:
+        upload_job = CsvUploadJob.objects.select_related('campaign').get(id=upload_id)
+        
+        # Until the import commits, the job row has no counts; rows read so
+        # far come from the worker's progress marker
+        rows_processed = upload_job.rows_processed
+        if upload_job.status == 'processing':
+            rows_processed = contact_import.get_progress(upload_job.id)
+        
+        return Response({
+            'success': True,
+            'data': {
+                'upload_id': str(upload_job.id),
+                'status': upload_job.status,
+                'file_name': upload_job.original_filename,
+                'campaign_id': str(upload_job.campaign_id),
+                'campaign_name': upload_job.campaign.name,
+                'rows_processed': rows_processed,
+                'created_contacts': upload_job.created_contacts,
+                'updated_contacts': upload_job.updated_contacts,
+                'total_processed': upload_job.created_contacts + upload_job.updated_contacts,
+                'duplicates_skipped': upload_job.duplicates_skipped,
+                'errors': upload_job.errors,
+                'error_count': upload_job.error_count,
+                'error_message': upload_job.error_message,
+                'created_at': upload_job.created_at,
+                'completed_at': upload_job.completed_at
+            }
+        }, status=status.HTTP_200_OK)
+        
+    except CsvUploadJob.DoesNotExist:
+        return Response({
+            'success': False,
+            'error': 'Upload not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -9,6 +9,7 @@ app_name = 'csv_upload'
 urlpatterns = [
     # CSV Upload endpoints
     path('upload-contacts/', csv_upload_views.upload_csv_contacts, name='upload_csv_contacts'),
+    path('upload/<uuid:upload_id>/status/', csv_upload_views.get_upload_status, name='upload_status'),
     path('upload-knowledge/', csv_upload_views.create_knowledge_base_from_csv, name='upload_knowledge_base'),
     
     # Campaign management
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 from calls.tasks import bulk_process_call_queue
 from calls.models import CallQueue
+from django.db.models import F
 from django.utils import timezone
 
 class Command(BaseCommand):
@@ -30,35 +31,46 @@ class Command(BaseCommand):
         priority = options['priority']
         dry_run = options['dry_run']
         
-        # Build query
+        # Build query (same predicate and order as the dispatcher, so it is
+        # served by the cq_dispatch_idx partial index)
         queryset = CallQueue.objects.filter(
             status='pending',
-            scheduled_time__lte=timezone.now()
+            scheduled_time__lte=timezone.now(),
+            attempt_count__lt=F('max_attempts')
         )
         
         if priority:
             queryset = queryset.filter(priority=priority)
         
-        queryset = queryset.order_by('priority', 'scheduled_time')[:limit]
+        # One SELECT with the contact joined, reading only the columns listed
+        # below (not call_config or other JSON); counts come from the list
+        items = list(
+            queryset.select_related('contact')
+            .only(
+                'id', 'priority', 'scheduled_time',
+                'contact__first_name', 'contact__last_name', 'contact__phone_number'
+            )
+            .order_by('priority_rank', 'scheduled_time')[:limit]
+        )
         
         if dry_run:
             self.stdout.write(
-                self.style.SUCCESS(f'Would process {queryset.count()} calls:')
+                self.style.SUCCESS(f'Would process {len(items)} calls:')
             )
-            for item in queryset:
+            for item in items:
                 self.stdout.write(
                     f'  - {item.contact.full_name} ({item.contact.phone_number}) '
                     f'- Priority: {item.priority} - Scheduled: {item.scheduled_time}'
                 )
         else:
-            if queryset.count() == 0:
+            if not items:
                 self.stdout.write(
                     self.style.WARNING('No pending calls to process')
                 )
                 return
             
             self.stdout.write(
-                self.style.SUCCESS(f'Processing {queryset.count()} calls...')
+                self.style.SUCCESS(f'Processing {len(items)} calls...')
             )
             
             result = bulk_process_call_queue()
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.7 on 2026-10-16 09:00
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_call_campaign(apps, schema_editor):
+    """Copy call_metadata['campaign_id'] into the new campaign FK"""
+    Call = apps.get_model('calls', 'Call')
+    Campaign = apps.get_model('scheduling', 'Campaign')
+
+    call_ids_by_campaign = {}
+    calls_with_campaign = Call.objects.filter(call_metadata__has_key='campaign_id').values_list('id', 'call_metadata')
+    for call_id, call_metadata in calls_with_campaign.iterator():
+        try:
+            campaign_id = uuid.UUID(str(call_metadata['campaign_id']))
+        except (TypeError, ValueError):
+            continue
+        call_ids_by_campaign.setdefault(campaign_id, []).append(call_id)
+
+    existing_campaigns = Campaign.objects.filter(id__in=list(call_ids_by_campaign)).values_list('id', flat=True)
+    for campaign_id in existing_campaigns:
+        Call.objects.filter(id__in=call_ids_by_campaign[campaign_id]).update(campaign_id=campaign_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0001_initial'),
+        ('scheduling', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='call',
+            name='campaign',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='calls', to='scheduling.campaign'),
+        ),
+        migrations.AddIndex(
+            model_name='call',
+            index=models.Index(fields=['campaign', 'created_at'], name='calls_campaign_created_idx'),
+        ),
+        migrations.RunPython(backfill_call_campaign, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.7 on 2026-10-16 09:00
+
+from django.db import migrations, models
+
+
+def backfill_task_id(apps, schema_editor):
+    """Move call_config['task_id'] into the new task_id column"""
+    CallQueue = apps.get_model('calls', 'CallQueue')
+
+    batch = []
+    entries = CallQueue.objects.filter(call_config__has_key='task_id').only('id', 'call_config')
+    for entry in entries.iterator(chunk_size=1000):
+        entry.task_id = str(entry.call_config.pop('task_id'))[:64]
+        batch.append(entry)
+        if len(batch) >= 1000:
+            CallQueue.objects.bulk_update(batch, ['task_id', 'call_config'])
+            batch = []
+    if batch:
+        CallQueue.objects.bulk_update(batch, ['task_id', 'call_config'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0002_call_campaign'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callqueue',
+            name='task_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='callqueue',
+            index=models.Index(fields=['task_id'], name='cq_task_id_idx'),
+        ),
+        migrations.RunPython(backfill_task_id, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.7 on 2026-10-16 09:00
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_queue_campaign(apps, schema_editor):
+    """Copy call_config['campaign_id'] into the new campaign FK"""
+    CallQueue = apps.get_model('calls', 'CallQueue')
+    Campaign = apps.get_model('scheduling', 'Campaign')
+
+    entry_ids_by_campaign = {}
+    entries_with_campaign = CallQueue.objects.filter(call_config__has_key='campaign_id').values_list('id', 'call_config')
+    for entry_id, call_config in entries_with_campaign.iterator():
+        try:
+            campaign_id = uuid.UUID(str(call_config['campaign_id']))
+        except (TypeError, ValueError):
+            continue
+        entry_ids_by_campaign.setdefault(campaign_id, []).append(entry_id)
+
+    existing_campaigns = Campaign.objects.filter(id__in=list(entry_ids_by_campaign)).values_list('id', flat=True)
+    for campaign_id in existing_campaigns:
+        CallQueue.objects.filter(id__in=entry_ids_by_campaign[campaign_id]).update(campaign_id=campaign_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0003_callqueue_task_id'),
+        ('scheduling', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callqueue',
+            name='campaign',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='queue_entries', to='scheduling.campaign'),
+        ),
+        migrations.RunPython(backfill_queue_campaign, migrations.RunPython.noop),
+    ]
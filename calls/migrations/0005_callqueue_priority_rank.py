@@ -0,0 +1,30 @@
+# Generated by Django 5.0.7 on 2026-10-16 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0004_callqueue_campaign'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callqueue',
+            name='priority_rank',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(priority='urgent', then=models.Value(0)), models.When(priority='high', then=models.Value(1)), models.When(priority='normal', then=models.Value(2)), default=models.Value(3)), output_field=models.SmallIntegerField()),
+        ),
+        migrations.AlterModelOptions(
+            name='callqueue',
+            options={'ordering': ['priority_rank', 'scheduled_time', 'created_at']},
+        ),
+        migrations.RemoveIndex(
+            model_name='callqueue',
+            name='call_queue_priorit_8c926e_idx',
+        ),
+        migrations.AddIndex(
+            model_name='callqueue',
+            index=models.Index(condition=models.Q(('attempt_count__lt', models.F('max_attempts')), ('status', 'pending')), fields=['status', 'priority_rank', 'scheduled_time'], name='cq_dispatch_idx'),
+        ),
+    ]
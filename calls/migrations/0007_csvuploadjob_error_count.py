@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-16 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0006_csvuploadjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvuploadjob',
+            name='error_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.7 on 2026-10-16 09:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0007_csvuploadjob_error_count'),
+    ]
+
+    operations = [
+        # The contact ForeignKeys already carry their own index
+        migrations.RemoveIndex(
+            model_name='call',
+            name='calls_contact_8fe0ae_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='callqueue',
+            name='call_queue_contact_2952ef_idx',
+        ),
+    ]
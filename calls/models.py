@@ -32,6 +32,7 @@ class Call(models.Model):
     # Participants
     contact = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name='calls')
     initiated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    campaign = models.ForeignKey('scheduling.Campaign', on_delete=models.SET_NULL, null=True, blank=True, related_name='calls')
     
     # Phone numbers
     from_number = models.CharField(max_length=20)
@@ -70,10 +71,10 @@ class Call(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['twilio_call_sid']),
-            models.Index(fields=['contact']),
             models.Index(fields=['call_type']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['campaign', 'created_at'], name='calls_campaign_created_idx'),
         ]
     
     def __str__(self):
@@ -183,11 +184,25 @@ class CallQueue(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     contact = models.ForeignKey(Contact, on_delete=models.CASCADE)
     call_template = models.ForeignKey(CallTemplate, on_delete=models.CASCADE, null=True, blank=True)
+    campaign = models.ForeignKey('scheduling.Campaign', on_delete=models.SET_NULL, null=True, blank=True, related_name='queue_entries')
     
     # Queue management
     status = models.CharField(max_length=20, choices=QUEUE_STATUS, default='pending')
     priority = models.CharField(max_length=20, choices=PRIORITY_LEVELS, default='normal')
     
+    # Dispatch order for priority (urgent first); the CharField itself sorts
+    # alphabetically, which would put 'high' before 'urgent'
+    priority_rank = models.GeneratedField(
+        expression=models.Case(
+            models.When(priority='urgent', then=models.Value(0)),
+            models.When(priority='high', then=models.Value(1)),
+            models.When(priority='normal', then=models.Value(2)),
+            default=models.Value(3),
+        ),
+        output_field=models.SmallIntegerField(),
+        db_persist=True,
+    )
+    
     # Scheduling
     scheduled_time = models.DateTimeField(null=True, blank=True)
     max_attempts = models.IntegerField(default=3)
@@ -196,6 +211,9 @@ class CallQueue(models.Model):
     # Configuration
     call_config = models.JSONField(default=dict, blank=True)
     
+    # Celery task that is placing the call (set by process_call_queue)
+    task_id = models.CharField(max_length=64, null=True, blank=True)
+    
     # Tracking
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -207,13 +225,66 @@ class CallQueue(models.Model):
     
     class Meta:
         db_table = 'call_queue'
-        ordering = ['priority', 'scheduled_time', 'created_at']
+        ordering = ['priority_rank', 'scheduled_time', 'created_at']
         indexes = [
             models.Index(fields=['status']),
-            models.Index(fields=['priority']),
             models.Index(fields=['scheduled_time']),
-            models.Index(fields=['contact']),
+            models.Index(fields=['task_id'], name='cq_task_id_idx'),
+            # Partial index over dispatchable rows only, matching the
+            # process_call_queue predicate run on every beat tick; column
+            # order follows its ORDER BY so the LIMITed batch is read in index
+            # order instead of being sorted
+            models.Index(
+                fields=['status', 'priority_rank', 'scheduled_time'],
+                name='cq_dispatch_idx',
+                condition=models.Q(status='pending', attempt_count__lt=models.F('max_attempts')),
+            ),
         ]
     
     def __str__(self):
         return f"Queue item for {self.contact.full_name} - {self.status}"
+
+
+class CsvUploadJob(models.Model):
+    """
+    Contacts CSV upload being imported in the background
+    """
+    JOB_STATUS = (
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    campaign = models.ForeignKey('scheduling.Campaign', on_delete=models.CASCADE, related_name='csv_uploads')
+    file_path = models.CharField(max_length=255)
+    original_filename = models.CharField(max_length=255)
+    
+    # Import options from the request
+    agent_preference = models.CharField(max_length=100)
+    call_priority = models.CharField(max_length=20, default='normal')
+    
+    status = models.CharField(max_length=20, choices=JOB_STATUS, default='queued')
+    
+    # Results (written once the import finishes)
+    rows_processed = models.IntegerField(default=0)
+    created_contacts = models.IntegerField(default=0)
+    updated_contacts = models.IntegerField(default=0)
+    duplicates_skipped = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    error_count = models.IntegerField(default=0)
+    error_message = models.TextField(null=True, blank=True)
+    
+    # Tracking
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'csv_upload_jobs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"CSV upload {self.original_filename} - {self.status}"
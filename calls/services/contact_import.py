@@ -0,0 +1,343 @@
+"""
+Bulk contact import shared by the CSV upload endpoint and its Celery task
+"""
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, F, Func, JSONField, Value, When
+from django.utils import timezone
+import pandas as pd
+import json
+import logging
+from datetime import datetime
+
+from crm.models import Contact, ContactNote
+from scheduling.models import CampaignContact
+
+logger = logging.getLogger(__name__)
+
+# Contact rows imported per bulk round (and held in memory at once)
+CSV_IMPORT_CHUNK_SIZE = 1000
+
+# Row errors listed in a result; the rest are only counted so a badly
+# formatted file cannot produce an unbounded error list
+MAX_REPORTED_ERRORS = 100
+
+# Rows read so far by a background upload; the import runs in one transaction,
+# so its progress cannot be read from the job row until it commits
+PROGRESS_KEY = 'csv_upload:{job_id}:rows'
+PROGRESS_TIMEOUT = 3600
+
+
+def set_progress(job_id, rows_read):
+    # Progress is informational; a cache outage must not fail the import
+    try:
+        cache.set(PROGRESS_KEY.format(job_id=job_id), rows_read, PROGRESS_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Could not record CSV upload progress: {str(e)}")
+
+
+def get_progress(job_id):
+    """
+    Rows read so far by the job's import (0 before the first chunk, or if
+    the cache is unreachable)
+    """
+    try:
+        return cache.get(PROGRESS_KEY.format(job_id=job_id), 0)
+    except Exception as e:
+        logger.warning(f"Could not read CSV upload progress: {str(e)}")
+        return 0
+
+
+def import_contacts(csv_stream, campaign, user, agent_preference, call_priority, on_progress=None):
+    """
+    Import a contacts CSV into ``campaign``
+    
+    The file is streamed in fixed-size chunks; phone numbers are normalized
+    per column and each chunk is written with a handful of bulk statements
+    instead of several queries per row. The whole file is one transaction:
+    one commit for every chunk, and a failed import leaves nothing behind.
+    
+    Args:
+        csv_stream: Binary file object positioned at the header row
+        on_progress: Optional callable given the number of rows read so far
+    
+    Returns:
+        dict: rows_processed, created_contacts, updated_contacts,
+            duplicates_skipped, errors (first MAX_REPORTED_ERRORS), error_count
+    """
+    errors = []
+    error_count = 0
+    created_count = updated_count = duplicates_skipped = rows_read = 0
+    
+    # One timestamp for the whole file: every row of an upload is stamped the
+    # same, and the per-row clock reads and isoformat() calls go away
+    timestamps = (datetime.now().isoformat(), timezone.now())
+    
+    with transaction.atomic():
+        for chunk in _read_contact_chunks(csv_stream):
+            rows_read += len(chunk)
+            missing_phone = _normalize_phone_numbers(chunk)
+            
+            # Header is row 1
+            row_numbers = chunk.index + 2
+            missing_rows = row_numbers[missing_phone.to_numpy()]
+            error_count += len(missing_rows)
+            errors.extend(
+                f"Row {row_number}: Phone number is required"
+                for row_number in missing_rows[:MAX_REPORTED_ERRORS - len(errors)]
+            )
+            
+            row_numbers = row_numbers[~missing_phone.to_numpy()]
+            chunk = chunk[~missing_phone]
+            
+            # Repeated numbers collapse to their last row before any DB work;
+            # notes on the dropped rows are still attached to the contact
+            duplicate = chunk.duplicated(subset='phone_number', keep='last')
+            extra_notes = []
+            if 'notes' in chunk:
+                dropped = chunk.loc[duplicate, ['phone_number', 'notes']]
+                extra_notes = [
+                    (phone_number, notes.strip())
+                    for phone_number, notes in dropped.itertuples(index=False) if notes.strip()
+                ]
+            duplicates_skipped += int(duplicate.sum())
+            
+            row_numbers = row_numbers[~duplicate.to_numpy()]
+            chunk = chunk[~duplicate]
+            rows = list(zip(row_numbers, chunk.to_dict('records')))
+            chunk_created, chunk_updated = _import_contact_rows(
+                rows, campaign, user, agent_preference, call_priority, timestamps,
+                extra_notes=extra_notes
+            )
+            created_count += chunk_created
+            updated_count += chunk_updated
+            
+            if on_progress:
+                on_progress(rows_read)
+    
+    return {
+        'rows_processed': rows_read,
+        'created_contacts': created_count,
+        'updated_contacts': updated_count,
+        'duplicates_skipped': duplicates_skipped,
+        'errors': errors,
+        'error_count': error_count,
+    }
+
+
+def _read_contact_chunks(csv_stream):
+    """
+    Stream the upload as DataFrames of CSV_IMPORT_CHUNK_SIZE rows; every cell
+    is kept as text and empty cells as ''
+    """
+    return pd.read_csv(
+        csv_stream, dtype=str, keep_default_na=False,
+        encoding='utf-8-sig', chunksize=CSV_IMPORT_CHUNK_SIZE
+    )
+
+
+def _normalize_phone_numbers(chunk):
+    """
+    Strip and prefix the chunk's phone numbers column-wide: numbers without a
+    leading '+' get '+92' in place of their leading zeros
+    
+    Returns:
+        Series: True for rows with no phone number
+    """
+    if 'phone_number' not in chunk:
+        chunk['phone_number'] = ''
+    phones = chunk['phone_number'].str.strip()
+    
+    missing = phones == ''
+    needs_prefix = ~missing & ~phones.str.startswith('+')
+    # Only the numbers being rewritten go through lstrip/concat; uploads are
+    # mostly in +E.164 already
+    if needs_prefix.any():
+        phones[needs_prefix] = '+92' + phones[needs_prefix].str.lstrip('0')
+    chunk['phone_number'] = phones
+    
+    return missing
+
+
+def _import_contact_rows(rows, campaign, user, agent_preference, call_priority, timestamps, extra_notes=()):
+    """
+    Create/update contacts for a batch of CSV rows and add them to the campaign
+    
+    Existing contacts are fetched with one query; new contacts, updates,
+    notes and campaign memberships are each written with one bulk statement.
+    
+    Args:
+        rows: (row_number, row dict) pairs; phone numbers already normalized
+        timestamps: (local ISO timestamp for JSON metadata, aware updated_at)
+        extra_notes: (phone_number, notes) pairs from rows dropped as duplicates
+    
+    Returns:
+        tuple: (created count, updated count)
+    """
+    now_iso, updated_at = timestamps
+    parsed_rows = [
+        (row_number, row, row.get('first_name', '').strip(), row.get('last_name', '').strip(), row['phone_number'])
+        for row_number, row in rows
+    ]
+    
+    if not parsed_rows:
+        return 0, 0
+    
+    # On PostgreSQL interaction history patches are merged in the UPDATE
+    # itself (jsonb ||), so the column is never loaded or re-serialized
+    merge_history_in_db = connection.vendor == 'postgresql'
+    contacts = Contact.objects.all()
+    if merge_history_in_db:
+        contacts = contacts.defer('ai_interaction_history')
+    existing_contacts = contacts.in_bulk(
+        {phone_number for *_, phone_number in parsed_rows}, field_name='phone_number'
+    )
+    new_contacts = {}
+    updated_contacts = {}
+    history_patches = {}
+    notes_by_phone = list(extra_notes)
+    updated_count = 0
+    
+    for row_number, row, first_name, last_name, phone_number in parsed_rows:
+        contact = existing_contacts.get(phone_number) or new_contacts.get(phone_number)
+        
+        if contact is None:
+            new_contacts[phone_number] = Contact(
+                phone_number=phone_number,
+                first_name=first_name or 'Unknown',
+                last_name=last_name or 'Contact',
+                email=(row.get('email') or '').strip(),
+                company=(row.get('company') or '').strip(),
+                job_title=(row.get('job_title') or '').strip(),
+                lead_source=row.get('lead_source', 'csv_upload'),
+                contact_type='lead',
+                status='active',
+                ai_interaction_history={
+                    'preferred_time': row.get('preferred_time', 'morning'),
+                    'language': row.get('language', 'urdu'),
+                    'timezone': row.get('timezone', 'Asia/Karachi'),
+                    'custom_field_1': row.get('custom_field_1', ''),
+                    'custom_field_2': row.get('custom_field_2', ''),
+                    'csv_upload_date': now_iso,
+                    'campaign_name': campaign.name
+                }
+            )
+        else:
+            # Update existing contact with new info
+            if row.get('email'):
+                contact.email = row.get('email').strip()
+            if row.get('company'):
+                contact.company = row.get('company').strip()
+            if row.get('job_title'):
+                contact.job_title = row.get('job_title').strip()
+            
+            # Update AI interaction history; keys the file does not carry
+            # keep their current values
+            history_patch = {
+                key: row[key] for key in ('preferred_time', 'language') if key in row
+            }
+            history_patch['last_csv_update'] = now_iso
+            contact.updated_at = updated_at
+            if phone_number in existing_contacts:
+                updated_contacts[phone_number] = contact
+                if merge_history_in_db:
+                    history_patches[contact.pk] = history_patch
+                    history_patch = None
+            if history_patch is not None:
+                contact.ai_interaction_history.update(history_patch)
+            updated_count += 1
+        
+        # Add notes if provided
+        notes = (row.get('notes') or '').strip()
+        if notes:
+            notes_by_phone.append((phone_number, notes))
+    
+    # Joins the caller's transaction when there is one
+    with transaction.atomic(savepoint=False):
+        # ignore_conflicts: a concurrent upload may have inserted the same
+        # number; re-read the new numbers so notes/memberships get real ids
+        Contact.objects.bulk_create(new_contacts.values(), batch_size=500, ignore_conflicts=True)
+        update_fields = ['email', 'company', 'job_title', 'updated_at']
+        if not merge_history_in_db:
+            update_fields.append('ai_interaction_history')
+        Contact.objects.bulk_update(updated_contacts.values(), update_fields, batch_size=500)
+        _merge_interaction_history(history_patches)
+        
+        contact_ids = {phone_number: contact.id for phone_number, contact in existing_contacts.items()}
+        contact_ids.update(
+            Contact.objects.filter(phone_number__in=list(new_contacts)).values_list('phone_number', 'id')
+        )
+        
+        ContactNote.objects.bulk_create([
+            ContactNote(
+                contact_id=contact_ids[phone_number],
+                title="CSV Upload Note",
+                content=notes,
+                created_by=user,
+                note_type='general'
+            )
+            for phone_number, notes in notes_by_phone
+        ], batch_size=500)
+        
+        # Add to campaign. Only contacts that existed before this chunk can
+        # already be members; one query finds them so re-uploads send no
+        # rows. ignore_conflicts still covers a concurrent upload
+        existing_members = set(
+            CampaignContact.objects.filter(
+                campaign=campaign,
+                contact_id__in=[contact.id for contact in existing_contacts.values()]
+            ).values_list('contact_id', flat=True)
+        )
+        CampaignContact.objects.bulk_create([
+            CampaignContact(
+                campaign=campaign,
+                contact_id=contact_id,
+                status='pending',
+                custom_data={
+                    'source': 'csv_upload',
+                    'agent_preference': agent_preference,
+                    'priority': call_priority,
+                    'assigned_agent_id': user.id,
+                    'upload_timestamp': now_iso
+                }
+            )
+            for contact_id in contact_ids.values()
+            if contact_id not in existing_members
+        ], batch_size=500, ignore_conflicts=True)
+    
+    return len(new_contacts), updated_count
+
+
+def _merge_interaction_history(history_patches):
+    """
+    Merge per-contact patches into ai_interaction_history with one UPDATE
+    
+    Contacts sharing the same patch share a WHEN branch, so the statement
+    grows with the number of distinct patches rather than contacts.
+    
+    Args:
+        history_patches: {contact pk: dict of keys to set}
+    """
+    if not history_patches:
+        return
+    
+    pks_by_patch = {}
+    for pk, patch in history_patches.items():
+        pks_by_patch.setdefault(json.dumps(patch, sort_keys=True), []).append(pk)
+    
+    Contact.objects.filter(pk__in=list(history_patches)).update(
+        ai_interaction_history=Case(
+            *[
+                When(pk__in=pks, then=Func(
+                    F('ai_interaction_history'),
+                    Value(json.loads(patch), output_field=JSONField()),
+                    template='(%(expressions)s)',
+                    arg_joiner=' || ',
+                    output_field=JSONField()
+                ))
+                for patch, pks in pks_by_patch.items()
+            ],
+            default=F('ai_interaction_history'),
+            output_field=JSONField()
+        )
+    )
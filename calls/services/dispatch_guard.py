@@ -0,0 +1,35 @@
+from calls.services.redis_client import get_client
+import logging
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Long enough to outlive every retry of a single task
+CALL_INITIATION_TIMEOUT = 3600
+
+# Held by an autonomous_agent_call execution that may have dialled; Celery keeps
+# the task id across retries and redeliveries
+CALL_INITIATION_KEY = 'twilio:init:{task_id}'
+
+
+def claim_call_initiation(task_id):
+    """
+    Claim the right to dial for a task; False if an earlier run of it already may have
+    """
+    try:
+        return bool(get_client().set(
+            CALL_INITIATION_KEY.format(task_id=task_id), 1, nx=True, ex=CALL_INITIATION_TIMEOUT
+        ))
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Call initiation guard unavailable, dialling without it: {str(e)}")
+        return True
+
+
+def release_call_initiation(task_id):
+    """
+    Drop the claim once it is certain no call was placed, so a retry may dial
+    """
+    try:
+        get_client().delete(CALL_INITIATION_KEY.format(task_id=task_id))
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Could not release call initiation guard: {str(e)}")
@@ -0,0 +1,53 @@
+from calls.services.redis_client import get_client
+import logging
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Hash of knowledge entry pk -> pending usage_count increment
+USAGE_KEY = 'kb_usage'
+
+def record_usage(knowledge_ids):
+    """
+    Add one use to each knowledge entry in a single round-trip
+
+    Returns:
+        bool: False if Redis is unavailable and the caller should write the counts itself
+    """
+    knowledge_ids = list(knowledge_ids)
+    if not knowledge_ids:
+        return True
+
+    try:
+        pipe = get_client().pipeline(transaction=False)
+        for knowledge_id in knowledge_ids:
+            pipe.hincrby(USAGE_KEY, str(knowledge_id), 1)
+        pipe.execute()
+        return True
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Knowledge usage counter unavailable: {str(e)}")
+        return False
+
+
+def drain_usage():
+    """
+    Atomically read and clear the pending increments
+
+    Returns:
+        dict: knowledge pk (str) -> increment
+    """
+    pipe = get_client().pipeline(transaction=True)
+    pipe.hgetall(USAGE_KEY)
+    pipe.delete(USAGE_KEY)
+    pending, _ = pipe.execute()
+    return {key.decode(): int(value) for key, value in pending.items()}
+
+
+def restore_usage(increments):
+    """
+    Put drained increments back after a failed flush so they are not lost
+    """
+    pipe = get_client().pipeline(transaction=False)
+    for knowledge_id, increment in increments.items():
+        pipe.hincrby(USAGE_KEY, knowledge_id, increment)
+    pipe.execute()
@@ -0,0 +1,47 @@
+from django.core.cache import cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Earliest scheduled_time (epoch seconds) among pending CallQueue entries
+NEXT_DUE_KEY = 'cq:next_ts'
+
+# Bounds staleness for writers that bypass model signals (bulk_create, update)
+NEXT_DUE_TIMEOUT = 60
+
+
+def is_queue_idle(now):
+    """
+    Return True when the cached marker says no queue entry is due yet
+    """
+    try:
+        next_due = cache.get(NEXT_DUE_KEY)
+    except Exception as e:
+        # Fail open: without the marker the dispatcher just queries the table
+        logger.warning(f"⚠️ Queue marker unavailable: {str(e)}")
+        return False
+    return next_due is not None and next_due > now.timestamp()
+
+
+def set_next_due(scheduled_time):
+    """
+    Record when the next pending entry becomes due (None means the queue is empty)
+    """
+    next_due = scheduled_time.timestamp() if scheduled_time else float('inf')
+    try:
+        cache.set(NEXT_DUE_KEY, next_due, NEXT_DUE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not store queue marker: {str(e)}")
+
+
+def invalidate():
+    """
+    Drop the marker so the next dispatcher run queries the table
+    
+    Called from model signals, so a cache outage must not fail the save
+    """
+    try:
+        cache.delete(NEXT_DUE_KEY)
+    except Exception as e:
+        # A marker left behind expires within NEXT_DUE_TIMEOUT
+        logger.warning(f"⚠️ Could not invalidate queue marker: {str(e)}")
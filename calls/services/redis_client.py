@@ -0,0 +1,17 @@
+from django.conf import settings
+import redis
+
+_client = None
+
+
+def get_client():
+    """
+    Shared Redis client for the services that talk to Redis directly
+
+    Connections come from the client's own pool, which redis-py rebuilds
+    after a fork, so one client per process is enough.
+    """
+    global _client
+    if _client is None:
+        _client = redis.from_url(settings.CELERY_BROKER_URL)
+    return _client
@@ -0,0 +1,21 @@
+import random
+
+
+def countdown(retries, base, cap, jitter=0):
+    """
+    Exponential back-off for Celery task retries
+    
+    Args:
+        retries: The task's request.retries (0 for the first retry)
+        base: Delay in seconds before the first retry; doubles per retry
+        cap: Longest delay in seconds, before jitter
+        jitter: Up to this many extra seconds, at random, so tasks that failed
+            together do not all retry together
+    
+    Returns:
+        float: Seconds to pass as the retry countdown
+    """
+    delay = min(cap, base * 2 ** retries)
+    if jitter:
+        delay += random.uniform(0, jitter)
+    return delay
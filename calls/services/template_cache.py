@@ -0,0 +1,84 @@
+from functools import lru_cache
+from django.core.cache import cache
+import logging
+
+from calls.models import CallTemplate
+
+logger = logging.getLogger(__name__)
+
+# Bumped on every template save/delete so each worker process drops its LRU entries
+VERSION_KEY = 'ct:version'
+
+
+def current_version():
+    """
+    Shared template version; read once per dispatcher batch
+    
+    None while the cache is unreachable: lookups then share one key, and
+    invalidate() still clears this process's entries
+    """
+    try:
+        return cache.get_or_set(VERSION_KEY, 0, None)
+    except Exception as e:
+        logger.warning(f"⚠️ Template cache version unavailable: {str(e)}")
+        return None
+
+
+def invalidate():
+    """
+    Retire all cached template lookups, in this process and in every other one
+    
+    Called from model signals, so a cache outage must not fail the save;
+    this process's entries are cleared either way
+    """
+    try:
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, None)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not bump template cache version: {str(e)}")
+    get_template_info.cache_clear()
+    get_active_template_pk.cache_clear()
+    get_agent_template_pk.cache_clear()
+
+
+@lru_cache(maxsize=256)
+def get_template_info(template_id, version):
+    """
+    Return (agent_name, template_type) for a CallTemplate
+
+    ``version`` is only part of the cache key: once another process bumps it,
+    lookups here miss and re-read the row.
+    """
+    template = CallTemplate.objects.only('template_type', 'conversation_flow').get(pk=template_id)
+    conversation_flow = template.conversation_flow or {}
+    return conversation_flow.get('agent_name', 'AI Agent'), template.template_type
+
+
+@lru_cache(maxsize=32)
+def get_active_template_pk(template_type, version):
+    """
+    PK of the active template for ``template_type``, falling back to any active
+    template (None if there is none)
+    """
+    active_templates = CallTemplate.objects.filter(is_active=True)
+    template_pk = active_templates.filter(template_type=template_type).values_list('pk', flat=True).first()
+    if template_pk is None:
+        template_pk = active_templates.values_list('pk', flat=True).first()
+    return template_pk
+
+
+@lru_cache(maxsize=64)
+def get_agent_template_pk(agent_name, version):
+    """
+    PK of an active template whose conversation flow names ``agent_name``,
+    falling back to the active sales template (None if there is neither)
+    """
+    active_templates = CallTemplate.objects.filter(is_active=True)
+    template_pk = active_templates.filter(
+        conversation_flow__agent_name__icontains=agent_name
+    ).values_list('pk', flat=True).first()
+    if template_pk is None:
+        template_pk = active_templates.filter(template_type='sales').values_list('pk', flat=True).first()
+    return template_pk
@@ -1,19 +1,107 @@
 from twilio.rest import Client
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
 from twilio.twiml.voice_response import VoiceResponse
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from functools import lru_cache
+from xml.sax.saxutils import escape
 import logging
+import os
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Placeholders rendered into the cached AI TwiML documents and substituted
+# (escaped) per response
+AI_RESPONSE_TOKEN = 'TWIMLAIRESPONSETOKEN'
+WEBHOOK_URL_TOKEN = 'TWIMLWEBHOOKURLTOKEN'
+
+# MP3 media of a recording, addressed by its account and sid
+RECORDING_MEDIA_URL = 'https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Recordings/{recording_sid}.mp3'
+
+
+@lru_cache(maxsize=256)
+def _say_twiml(message, voice, language):
+    """
+    TwiML document that just speaks ``message``; fixed prompts repeat across
+    calls, so the serialized XML is reused
+    """
+    response = VoiceResponse()
+    response.say(message, voice=voice, language=language)
+    return str(response)
+
+
+@lru_cache(maxsize=32)
+def _ai_twiml_template(voice, gather_input):
+    """
+    AI response TwiML with placeholders for the response text and webhook
+    URL; the tree is built and serialized once per (voice, gather) shape
+    """
+    response = VoiceResponse()
+    
+    # Speak the AI response
+    response.say(AI_RESPONSE_TOKEN, voice=voice, language='en-US')
+    
+    # If we need to gather input from the caller
+    if gather_input:
+        response.gather(
+            input='speech',
+            timeout=3,
+            speech_timeout='auto',
+            action=WEBHOOK_URL_TOKEN,
+            method='POST'
+        )
+        
+        # Add a fallback message if no input is received
+        response.say("I didn't hear anything. Please try again.", voice=voice)
+        response.redirect(WEBHOOK_URL_TOKEN)
+    
+    return str(response)
+
 class TwilioService:
     """
     Service class for Twilio integration
     """
     
     def __init__(self):
-        self.client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+        self._client = None
+        self._client_pid = None
+        self._client_lock = threading.Lock()
         self.from_number = settings.TWILIO_PHONE_NUMBER
     
+    @property
+    def client(self):
+        """
+        Shared REST client; built on first use in each process, so processes
+        that never call Twilio never build one, and a process forked after
+        first use (without worker_process_init) does not reuse its parent's
+        sockets
+        """
+        if self._client is None or self._client_pid != os.getpid():
+            with self._client_lock:
+                if self._client is None or self._client_pid != os.getpid():
+                    self._client = self._build_client()
+                    self._client_pid = os.getpid()
+        return self._client
+    
+    def _build_client(self):
+        """
+        Create a REST client backed by one pooled, keep-alive HTTPS session
+        """
+        http_client = TwilioHttpClient(pool_connections=True)
+        pool_size = getattr(settings, 'TWILIO_HTTP_POOL_SIZE', 50)
+        http_client.session.mount('https://', HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+        
+        return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=http_client)
+    
+    def reset_client(self):
+        """
+        Drop the client (and its connection pool) - used after fork so
+        worker processes never share sockets with their parent
+        """
+        self._client = None
+    
     def initiate_call(self, to_number, webhook_url, call_data=None):
         """
         Initiate an outbound call
@@ -43,7 +131,10 @@ class TwilioService:
             logger.error(f"Failed to initiate call to {to_number}: {str(e)}")
             return {
                 'success': False,
-                'error': str(e)
+                'error': str(e),
+                # Twilio answered with an error, so no call was created; any
+                # other failure (timeout, dropped connection) may have dialled
+                'rejected': isinstance(e, TwilioRestException)
             }
     
     def get_call_details(self, call_sid):
@@ -83,34 +174,21 @@ class TwilioService:
         """
         Generate TwiML response for voice calls
         """
-        response = VoiceResponse()
-        response.say(message, voice=voice, language=language)
-        return str(response)
+        return _say_twiml(message, voice, language)
     
     def generate_ai_twiml_response(self, ai_response, voice='alice', gather_input=False, webhook_url=None):
         """
         Generate TwiML response with AI integration
-        """
-        response = VoiceResponse()
         
-        # Speak the AI response
-        response.say(ai_response, voice=voice, language='en-US')
-        
-        # If we need to gather input from the caller
-        if gather_input and webhook_url:
-            gather = response.gather(
-                input='speech',
-                timeout=3,
-                speech_timeout='auto',
-                action=webhook_url,
-                method='POST'
-            )
-            
-            # Add a fallback message if no input is received
-            response.say("I didn't hear anything. Please try again.", voice=voice)
-            response.redirect(webhook_url)
-        
-        return str(response)
+        Fills a cached document instead of building and serializing a new
+        VoiceResponse tree; values are escaped as ElementTree would (the URL
+        also sits in an attribute, so quotes are escaped too)
+        """
+        gather_input = bool(gather_input and webhook_url)
+        twiml = _ai_twiml_template(voice, gather_input)
+        if gather_input:
+            twiml = twiml.replace(WEBHOOK_URL_TOKEN, escape(webhook_url, {'"': '&quot;'}))
+        return twiml.replace(AI_RESPONSE_TOKEN, escape(ai_response))
     
     def create_conference(self, conference_name, participant_numbers, webhook_url):
         """
@@ -153,7 +231,9 @@ class TwilioService:
                     'duration': recording.duration,
                     'date_created': recording.date_created,
                     'uri': recording.uri,
-                    'media_url': f"https://api.twilio.com{recording.uri.replace('.json', '.mp3')}"
+                    'media_url': RECORDING_MEDIA_URL.format(
+                        account_sid=recording.account_sid, recording_sid=recording.sid
+                    )
                 }
                 for recording in recordings
             ]
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from calls.models import CallQueue, CallTemplate
+from calls.services import queue_marker, template_cache
+
+
+@receiver(post_save, sender=CallQueue)
+def invalidate_queue_marker(sender, instance, **kwargs):
+    """
+    A new or re-pended entry may be due earlier than the cached marker
+    """
+    if instance.status == 'pending':
+        queue_marker.invalidate()
+
+
+@receiver(post_save, sender=CallTemplate)
+@receiver(post_delete, sender=CallTemplate)
+def invalidate_template_cache(sender, instance, **kwargs):
+    """
+    Agent name / template type may have changed
+    """
+    template_cache.invalidate()
@@ -1,32 +1,110 @@
 from celery import shared_task
+from celery.exceptions import Retry
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
 from django.utils import timezone
-from calls.models import Call, CallQueue
+from calls.models import Call, CallConversation, CallQueue, CsvUploadJob
+from calls.services import contact_import, dispatch_guard, retry_backoff
 from calls.services.twilio_service import twilio_service
 from ai_integration.services.ai_service import ai_service
 from crm.models import Contact
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
-@shared_task(bind=True, max_retries=3)
-def process_outbound_call(self, queue_item_id):
+# Retry delays for process_outbound_call: 60s, 120s, 240s ... capped at an
+# hour, plus up to a minute of jitter so calls that failed together (e.g.
+# during a Twilio outage) do not all retry together
+OUTBOUND_CALL_RETRY_BACKOFF = {'base': 60, 'cap': 3600, 'jitter': 60}
+
+# Concurrent Twilio recording lookups in sync_call_recordings; well under
+# Twilio's concurrency limit and the Twilio connection pool size
+RECORDING_SYNC_WORKERS = 16
+
+# Conversations deleted per statement batch in cleanup_old_conversations
+CLEANUP_BATCH_SIZE = 1000
+
+# A CSV upload still 'processing' after this long lost its worker. The import
+# is one transaction that rolled back with it, so the job can be run again;
+# keep this well above the longest import
+CSV_UPLOAD_STALE_AFTER = timedelta(hours=2)
+
+# acks_late + reject_on_worker_lost: a worker dying mid-task hands the call
+# back to the broker; the call-initiation guard below keeps a redelivery from
+# dialling twice
+@shared_task(bind=True, max_retries=3, acks_late=True, reject_on_worker_lost=True)
+def process_outbound_call(self, queue_item_id, claimed=False):
     """
     Process an outbound call from the queue
+    
+    Args:
+        queue_item_id: CallQueue entry to call
+        claimed: True when the caller (bulk_process_call_queue) already moved the
+            entry to in_progress and counted the attempt. Retries always go
+            back through the conditional claim below
     """
+    task_id = self.request.id
+    initiation_claimed = False
+    dialled = False
     try:
-        queue_item = CallQueue.objects.get(id=queue_item_id)
+        # The contact is read below, so it is joined in; the JSON columns
+        # (call_config, the contact's interaction history) are never used
+        # here and are left unloaded. Only the template's id is needed
+        queue_item = (
+            CallQueue.objects
+            .select_related('contact')
+            .defer('call_config', 'contact__ai_interaction_history')
+            .get(id=queue_item_id)
+        )
         
         # Check if contact allows calls
         if queue_item.contact.do_not_call:
             queue_item.status = 'cancelled'
             queue_item.result_notes = 'Contact is on do-not-call list'
-            queue_item.save()
+            queue_item.save(update_fields=['status', 'result_notes', 'updated_at'])
             return {'status': 'cancelled', 'reason': 'do_not_call'}
         
-        # Update queue item status
-        queue_item.status = 'in_progress'
-        queue_item.attempt_count += 1
-        queue_item.save()
+        # Claim the item: one conditional UPDATE flips the status and bumps the
+        # attempt counter in the database, and loses cleanly if another worker
+        # already took it or the entry has used up its attempts
+        if not claimed:
+            claimed = CallQueue.objects.filter(
+                id=queue_item.id,
+                status='pending',
+                attempt_count__lt=F('max_attempts')
+            ).update(
+                status='in_progress',
+                attempt_count=F('attempt_count') + 1,
+                task_id=task_id,
+                updated_at=timezone.now()
+            )
+            if claimed:
+                queue_item.status = 'in_progress'
+                queue_item.attempt_count += 1
+            elif task_id and queue_item.status == 'in_progress' and queue_item.task_id == task_id:
+                # Redelivered after this task had already claimed the entry
+                claimed = True
+            else:
+                logger.info(f"Queue item {queue_item_id} already claimed, skipping")
+                return {'status': 'skipped', 'reason': 'already_claimed'}
+        
+        # Dial at most once per task: retries and redeliveries keep the task id,
+        # and Twilio call creation is not idempotent
+        if task_id:
+            if not dispatch_guard.claim_call_initiation(task_id):
+                logger.warning(f"Task {task_id} may already have dialled queue item {queue_item_id}, skipping")
+                # The earlier run died before recording the outcome; close the
+                # entry instead of leaving it in_progress
+                CallQueue.objects.filter(id=queue_item_id, status='in_progress', call__isnull=True).update(
+                    status='failed',
+                    result_notes='Worker lost after dialling; call outcome unknown',
+                    updated_at=timezone.now()
+                )
+                return {'status': 'deduped'}
+            initiation_claimed = True
         
         # Create call record
         call = Call.objects.create(
@@ -47,23 +125,31 @@ def process_outbound_call(self, queue_item_id):
             webhook_url=webhook_url,
             call_data={
                 'call_id': str(call.id),
-                'template_id': str(queue_item.call_template.id) if queue_item.call_template else None,
+                'template_id': str(queue_item.call_template_id) if queue_item.call_template_id else None,
                 'contact_id': str(queue_item.contact.id)
             }
         )
+        dialled = True
         
         if result['success']:
-            # Update call with Twilio SID
-            call.twilio_call_sid = result['call_sid']
-            call.status = 'initiated'
-            call.started_at = timezone.now()
-            call.save()
-            
-            # Update queue item
-            queue_item.call = call
-            queue_item.status = 'completed'
-            queue_item.result_notes = f"Call initiated successfully: {result['call_sid']}"
-            queue_item.save()
+            # Both rows are written with targeted UPDATEs (no instance save
+            # machinery) and committed together
+            now = timezone.now()
+            with transaction.atomic():
+                # Update call with Twilio SID
+                Call.objects.filter(id=call.id).update(
+                    twilio_call_sid=result['call_sid'],
+                    status='initiated',
+                    started_at=now
+                )
+                
+                # Update queue item
+                CallQueue.objects.filter(id=queue_item.id).update(
+                    call_id=call.id,
+                    status='completed',
+                    result_notes=f"Call initiated successfully: {result['call_sid']}",
+                    updated_at=now
+                )
             
             logger.info(f"Outbound call initiated: {result['call_sid']} to {queue_item.contact.phone_number}")
             
@@ -73,50 +159,121 @@ def process_outbound_call(self, queue_item_id):
                 'call_id': str(call.id)
             }
         else:
-            # Handle failure
-            call.status = 'failed'
-            call.save()
-            
-            if queue_item.attempt_count < queue_item.max_attempts:
-                queue_item.status = 'pending'
-                queue_item.result_notes = f"Attempt {queue_item.attempt_count} failed: {result['error']}"
-                queue_item.save()
+            # Handle failure: the call and queue updates share one commit.
+            # The queue item keeps save() so a re-pended entry still wakes
+            # the dispatcher through post_save
+            will_retry = queue_item.attempt_count < queue_item.max_attempts
+            with transaction.atomic():
+                Call.objects.filter(id=call.id).update(status='failed')
                 
-                # Retry after delay
-                self.retry(countdown=300)  # Retry after 5 minutes
-            else:
-                queue_item.status = 'failed'
-                queue_item.result_notes = f"Max attempts reached. Last error: {result['error']}"
-                queue_item.save()
+                if will_retry:
+                    queue_item.status = 'pending'
+                    queue_item.result_notes = f"Attempt {queue_item.attempt_count} failed: {result['error']}"
+                else:
+                    queue_item.status = 'failed'
+                    queue_item.result_notes = f"Max attempts reached. Last error: {result['error']}"
+                queue_item.save(update_fields=['status', 'result_notes', 'updated_at'])
+            
+            if will_retry and self.request.retries < self.max_retries:
+                # Retry after a backed-off, jittered delay. The entry is pending
+                # again, so the retry claims it like any other dispatcher and
+                # loses if bulk_process_call_queue got there first
+                if initiation_claimed:
+                    dispatch_guard.release_call_initiation(task_id)
+                raise self.retry(
+                    args=[queue_item_id],
+                    kwargs={'claimed': False},
+                    countdown=retry_backoff.countdown(self.request.retries, **OUTBOUND_CALL_RETRY_BACKOFF)
+                )
             
             return {
                 'status': 'failed',
                 'error': result['error']
             }
             
+    except Retry:
+        raise
     except Exception as e:
         logger.error(f"Error processing outbound call {queue_item_id}: {str(e)}")
-        if self.request.retries < self.max_retries:
-            self.retry(countdown=60)
+        if self.request.retries < self.max_retries and not dialled:
+            # Hand our claims back before retrying so the retry can claim the
+            # entry again and dial
+            if initiation_claimed:
+                dispatch_guard.release_call_initiation(task_id)
+            if claimed:
+                CallQueue.objects.filter(id=queue_item_id, status='in_progress').update(
+                    status='pending',
+                    updated_at=timezone.now()
+                )
+            raise self.retry(
+                exc=e,
+                args=[queue_item_id],
+                kwargs={'claimed': False},
+                countdown=retry_backoff.countdown(self.request.retries, **OUTBOUND_CALL_RETRY_BACKOFF)
+            )
+        if claimed:
+            # Out of retries, or Twilio already answered and the call may have
+            # gone out: close the entry rather than leave it in_progress
+            CallQueue.objects.filter(id=queue_item_id, status='in_progress').update(
+                status='failed',
+                result_notes=f"Error processing call: {str(e)}",
+                updated_at=timezone.now()
+            )
         return {'status': 'error', 'error': str(e)}
 
-@shared_task
+
+# Acked late so a worker lost mid-run re-runs the dispatch; entries it had
+# already claimed but not published are handed back by reap_stale_queue_claims
+@shared_task(acks_late=True, reject_on_worker_lost=True)
 def bulk_process_call_queue():
     """
     Process pending items in the call queue
     """
-    pending_items = CallQueue.objects.filter(
-        status='pending',
-        scheduled_time__lte=timezone.now()
-    ).order_by('priority', 'scheduled_time')[:10]  # Process 10 at a time
+    current_time = timezone.now()
     
+    # Claim the batch atomically: rows locked by a concurrent run are skipped,
+    # and one UPDATE moves the claimed rows to in_progress. Only the ids are
+    # forwarded; process_outbound_call loads each row (with its contact and
+    # template) itself, outside the lock.
+    with transaction.atomic():
+        pending_item_ids = list(
+            CallQueue.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                status='pending',
+                scheduled_time__lte=current_time,
+                attempt_count__lt=F('max_attempts')
+            )
+            .order_by('priority_rank', 'scheduled_time')
+            .values_list('id', flat=True)[:10]  # Process 10 at a time
+        )
+        if pending_item_ids:
+            CallQueue.objects.filter(id__in=pending_item_ids).update(
+                status='in_progress',
+                attempt_count=F('attempt_count') + 1,
+                task_id=None,
+                updated_at=current_time
+            )
+    
+    # Publish the whole batch over one pooled broker connection instead of
+    # acquiring a producer per .delay() call
     results = []
-    for item in pending_items:
-        result = process_outbound_call.delay(str(item.id))
-        results.append({
-            'queue_item_id': str(item.id),
-            'task_id': result.id
-        })
+    with process_outbound_call.app.producer_pool.acquire(block=True) as producer:
+        for item_id in pending_item_ids:
+            result = process_outbound_call.apply_async(
+                args=[str(item_id)], kwargs={'claimed': True}, producer=producer
+            )
+            results.append({
+                'queue_item_id': str(item_id),
+                'task_id': result.id
+            })
+    
+    # A claimed entry without a task id was never published;
+    # reap_stale_queue_claims hands those back
+    CallQueue.objects.bulk_update(
+        [CallQueue(id=item['queue_item_id'], task_id=item['task_id']) for item in results],
+        ['task_id']
+    )
     
     return {
         'processed_items': len(results),
@@ -129,9 +286,11 @@ def process_ai_conversation(call_id, user_input, conversation_id=None):
     Process AI conversation for a call
     """
     try:
-        call = Call.objects.get(id=call_id)
+        # The contact feeds the system prompt on the first turn; join it in
+        call = Call.objects.select_related('contact').get(id=call_id)
         
-        # Create or get AI conversation
+        # Create or get AI conversation; the system prompt is only built
+        # here, once per conversation
         if conversation_id:
             conversation = ai_service.get_conversation(conversation_id)
         else:
@@ -141,26 +300,29 @@ def process_ai_conversation(call_id, user_input, conversation_id=None):
                 system_prompt=_get_call_system_prompt(call)
             )
             call.ai_conversation_id = str(conversation.id)
-            call.save()
+            call.save(update_fields=['ai_conversation_id'])
         
         # Generate AI response
         response = ai_service.generate_response(conversation, user_input)
         
         if response['success']:
-            # Log the conversation
-            from calls.models import CallConversation
-            CallConversation.objects.create(
-                call=call,
-                speaker_type='human',
-                message=user_input
-            )
-            CallConversation.objects.create(
-                call=call,
-                speaker_type='ai',
-                message=response['response'],
-                ai_model_used=response.get('model_used'),
-                confidence_score=0.95  # Placeholder
-            )
+            # Log the conversation: both turns in one INSERT, committed
+            # together (timestamps are still taken in order, human first)
+            with transaction.atomic():
+                CallConversation.objects.bulk_create([
+                    CallConversation(
+                        call=call,
+                        speaker_type='human',
+                        message=user_input
+                    ),
+                    CallConversation(
+                        call=call,
+                        speaker_type='ai',
+                        message=response['response'],
+                        ai_model_used=response.get('model_used'),
+                        confidence_score=0.95  # Placeholder
+                    )
+                ])
             
             return {
                 'status': 'success',
@@ -224,10 +386,18 @@ def cleanup_old_conversations():
     old_conversations = AIConversation.objects.filter(
         completed_at__lt=cutoff_date,
         status='completed'
-    )
+    ).order_by()
     
-    deleted_count = old_conversations.count()
-    old_conversations.delete()
+    # Delete in bounded batches: each delete() collects and cascades (messages,
+    # training data) for at most CLEANUP_BATCH_SIZE conversations, in its own
+    # short transaction; the deleted counts replace a separate COUNT query
+    deleted_count = 0
+    while True:
+        batch_ids = list(old_conversations.values_list('id', flat=True)[:CLEANUP_BATCH_SIZE])
+        if not batch_ids:
+            break
+        _, deleted_by_model = AIConversation.objects.filter(id__in=batch_ids).delete()
+        deleted_count += deleted_by_model.get(AIConversation._meta.label, 0)
     
     logger.info(f"Cleaned up {deleted_count} old conversations")
     
@@ -244,23 +414,30 @@ def sync_call_recordings():
     from datetime import timedelta
     
     # Get calls from last 24 hours that might have recordings
-    recent_calls = Call.objects.filter(
+    recent_calls = list(Call.objects.filter(
         created_at__gte=timezone.now() - timedelta(hours=24),
         status='completed',
         recording_url__isnull=True,
         twilio_call_sid__isnull=False
-    )
+    ).only('id', 'twilio_call_sid'))
     
-    synced_count = 0
-    for call in recent_calls:
-        recordings = twilio_service.get_recordings(call.twilio_call_sid)
-        if recordings:
-            # Use the first recording
-            recording = recordings[0]
-            call.recording_url = recording['media_url']
-            call.recording_sid = recording['sid']
-            call.save()
-            synced_count += 1
+    # Each lookup is an independent Twilio round-trip: run them concurrently
+    # over the pooled session, then write all results in one bulk UPDATE
+    synced_calls = []
+    with ThreadPoolExecutor(max_workers=RECORDING_SYNC_WORKERS) as executor:
+        call_recordings = executor.map(
+            twilio_service.get_recordings, [call.twilio_call_sid for call in recent_calls]
+        )
+        for call, recordings in zip(recent_calls, call_recordings):
+            if recordings:
+                # Use the first recording
+                recording = recordings[0]
+                call.recording_url = recording['media_url']
+                call.recording_sid = recording['sid']
+                synced_calls.append(call)
+    
+    Call.objects.bulk_update(synced_calls, ['recording_url', 'recording_sid'], batch_size=500)
+    synced_count = len(synced_calls)
     
     logger.info(f"Synced {synced_count} call recordings")
     
@@ -269,19 +446,97 @@ def sync_call_recordings():
         'synced_recordings': synced_count
     }
 
+@shared_task
+def process_contacts_csv_task(upload_job_id):
+    """
+    Import a contacts CSV saved by upload_csv_contacts
+    """
+    # Only one delivery runs the import; a job whose worker died mid-import
+    # is taken over once it has gone stale
+    now = timezone.now()
+    claimed = CsvUploadJob.objects.filter(
+        Q(status='queued') | Q(status='processing', updated_at__lt=now - CSV_UPLOAD_STALE_AFTER),
+        id=upload_job_id
+    ).update(status='processing', updated_at=now)
+    if not claimed:
+        return {'status': 'skipped', 'reason': 'already_processed'}
+    
+    job = CsvUploadJob.objects.select_related('campaign', 'created_by').get(id=upload_job_id)
+    
+    try:
+        with default_storage.open(job.file_path, 'rb') as csv_stream:
+            result = contact_import.import_contacts(
+                csv_stream, job.campaign, job.created_by, job.agent_preference, job.call_priority,
+                on_progress=lambda rows_read: contact_import.set_progress(job.id, rows_read)
+            )
+    except Exception as e:
+        logger.error(f"Error importing CSV upload {upload_job_id}: {str(e)}")
+        job.status = 'failed'
+        job.error_message = str(e)
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'completed_at', 'updated_at'])
+        return {'status': 'error', 'error': str(e)}
+    finally:
+        default_storage.delete(job.file_path)
+    
+    job.status = 'completed'
+    job.rows_processed = result['rows_processed']
+    job.created_contacts = result['created_contacts']
+    job.updated_contacts = result['updated_contacts']
+    job.duplicates_skipped = result['duplicates_skipped']
+    job.errors = result['errors']
+    job.error_count = result['error_count']
+    job.completed_at = timezone.now()
+    job.save()
+    
+    logger.info(
+        f"Imported CSV upload {upload_job_id}: {job.created_contacts} created, {job.updated_contacts} updated"
+    )
+    
+    return {
+        'status': 'success',
+        'created_contacts': job.created_contacts,
+        'updated_contacts': job.updated_contacts
+    }
+
+@shared_task
+def requeue_stale_csv_uploads():
+    """
+    Re-send CSV uploads that stalled: still queued or processing after
+    CSV_UPLOAD_STALE_AFTER (lost task message, or a worker that died)
+    """
+    stale_job_ids = list(
+        CsvUploadJob.objects
+        .filter(status__in=['queued', 'processing'], updated_at__lt=timezone.now() - CSV_UPLOAD_STALE_AFTER)
+        .values_list('id', flat=True)
+    )
+    for job_id in stale_job_ids:
+        process_contacts_csv_task.delay(str(job_id))
+    
+    if stale_job_ids:
+        logger.warning(f"Re-sent {len(stale_job_ids)} stale CSV uploads")
+    
+    return {'requeued_uploads': len(stale_job_ids)}
+
 def _get_call_system_prompt(call):
     """
     Generate system prompt for call based on call template or default
     """
-    if call.call_template:
-        return call.call_template.initial_greeting
+    # Calls carry no template themselves; it is on the queue entry that
+    # placed the call. Only its greeting is read
+    initial_greeting = CallQueue.objects.filter(
+        call=call, call_template__isnull=False
+    ).values_list('call_template__initial_greeting', flat=True).first()
+    if initial_greeting:
+        return initial_greeting
     
-    return f"""You are a professional AI assistant representing our company. You are speaking with {call.contact.first_name} {call.contact.last_name}.
+    contact = call.contact
+    return f"""You are a professional AI assistant representing our company. You are speaking with {contact.first_name} {contact.last_name}.
 
 Key information about this contact:
-- Name: {call.contact.full_name}
-- Company: {call.contact.company or 'Not provided'}
-- Previous interactions: {call.contact.ai_interaction_history}
+- Name: {contact.full_name}
+- Company: {contact.company or 'Not provided'}
+- Previous interactions: {contact.ai_interaction_history}
 
 Guidelines:
 1. Be professional and friendly
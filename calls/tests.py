@@ -1,3 +1,623 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import redis
+from celery.exceptions import Retry
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from kombu.exceptions import OperationalError as BrokerOperationalError
+from rest_framework.test import APIClient
+from twilio.twiml.voice_response import VoiceResponse
+
+from calls.autonomous_agent import (
+    ALL_DAYS_MASK, STALE_CLAIM_TIMEOUT, _allowed_days_mask, _days_until_next_allowed,
+    process_call_queue, reap_stale_queue_claims
+)
+from calls.models import Call, CallQueue, CallTemplate, CsvUploadJob
+from calls.services import contact_import, dispatch_guard, queue_marker, retry_backoff, template_cache
+from calls.services.twilio_service import twilio_service
+from calls.tasks import (
+    CSV_UPLOAD_STALE_AFTER, bulk_process_call_queue, process_contacts_csv_task, process_outbound_call,
+    requeue_stale_csv_uploads
+)
+from crm.models import Contact, ContactNote
+from scheduling.models import Campaign, CampaignContact
+
+# Row 4 repeats row 2's number once normalized; row 5 has no phone number
+CONTACTS_CSV = (
+    "first_name,last_name,phone_number,email,notes\n"
+    "Ali,Khan,03001234567,ali@example.com,First note\n"
+    "Sara,Ahmed,+923007654321,,\n"
+    "Ali,Khan,+923001234567,ali.khan@example.com,Second note\n"
+    ",,,,Missing phone\n"
+)
+
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def _csv_stream(text):
+    return io.BytesIO(text.encode('utf-8'))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CsvImportTestCase(TestCase):
+    """Shared fixtures for the contact CSV import tests"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader', password='secret')
+        self.campaign = Campaign.objects.create(
+            name='CSV Upload Campaign',
+            campaign_type='bulk_calls',
+            start_date=timezone.now(),
+            created_by=self.user
+        )
+
+    def import_csv(self, text):
+        return contact_import.import_contacts(
+            _csv_stream(text), self.campaign, self.user, 'Ali Khan', 'normal'
+        )
+
+
+class ImportContactsTests(CsvImportTestCase):
+
+    def test_import_normalizes_phones_and_skips_duplicates(self):
+        result = self.import_csv(CONTACTS_CSV)
+
+        self.assertEqual(result['rows_processed'], 4)
+        self.assertEqual(result['created_contacts'], 2)
+        self.assertEqual(result['updated_contacts'], 0)
+        self.assertEqual(result['duplicates_skipped'], 1)
+        self.assertEqual(result['errors'], ['Row 5: Phone number is required'])
+        self.assertEqual(result['error_count'], 1)
+
+        self.assertEqual(
+            set(Contact.objects.values_list('phone_number', flat=True)),
+            {'+923001234567', '+923007654321'}
+        )
+        # The last row for a repeated number wins
+        ali = Contact.objects.get(phone_number='+923001234567')
+        self.assertEqual(ali.email, 'ali.khan@example.com')
+
+    def test_import_keeps_notes_from_duplicate_rows(self):
+        self.import_csv(CONTACTS_CSV)
+
+        ali = Contact.objects.get(phone_number='+923001234567')
+        self.assertEqual(
+            set(ContactNote.objects.filter(contact=ali).values_list('content', flat=True)),
+            {'First note', 'Second note'}
+        )
+        sara = Contact.objects.get(phone_number='+923007654321')
+        self.assertFalse(ContactNote.objects.filter(contact=sara).exists())
+
+    def test_import_adds_contacts_to_campaign(self):
+        self.import_csv(CONTACTS_CSV)
+
+        memberships = CampaignContact.objects.filter(campaign=self.campaign)
+        self.assertEqual(memberships.count(), 2)
+        membership = memberships.get(contact__phone_number='+923007654321')
+        self.assertEqual(membership.status, 'pending')
+        self.assertEqual(membership.custom_data['source'], 'csv_upload')
+        self.assertEqual(membership.custom_data['assigned_agent_id'], self.user.id)
+
+    def test_reupload_updates_without_duplicating(self):
+        self.import_csv(CONTACTS_CSV)
+        result = self.import_csv(CONTACTS_CSV)
+
+        self.assertEqual(result['created_contacts'], 0)
+        self.assertEqual(result['updated_contacts'], 2)
+        self.assertEqual(Contact.objects.count(), 2)
+        self.assertEqual(CampaignContact.objects.filter(campaign=self.campaign).count(), 2)
+
+    def test_error_list_is_capped(self):
+        missing_rows = contact_import.MAX_REPORTED_ERRORS + 5
+        text = "first_name,phone_number\n" + "Nobody,\n" * missing_rows
+
+        result = self.import_csv(text)
+
+        self.assertEqual(len(result['errors']), contact_import.MAX_REPORTED_ERRORS)
+        self.assertEqual(result['error_count'], missing_rows)
+        self.assertEqual(result['errors'][0], 'Row 2: Phone number is required')
+
+
+class ProcessContactsCsvTaskTests(CsvImportTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+    def create_job(self, text=CONTACTS_CSV, **fields):
+        file_path = default_storage.save('csv_uploads/contacts.csv', ContentFile(text.encode('utf-8')))
+        return CsvUploadJob.objects.create(
+            campaign=self.campaign,
+            file_path=file_path,
+            original_filename='contacts.csv',
+            agent_preference='Ali Khan',
+            created_by=self.user,
+            **fields
+        )
+
+    def test_task_imports_and_records_results(self):
+        job = self.create_job()
+
+        result = process_contacts_csv_task(str(job.id))
+
+        self.assertEqual(result['status'], 'success')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.rows_processed, 4)
+        self.assertEqual(job.created_contacts, 2)
+        self.assertEqual(job.duplicates_skipped, 1)
+        self.assertEqual(job.error_count, 1)
+        self.assertIsNotNone(job.completed_at)
+        self.assertFalse(default_storage.exists(job.file_path))
+
+    def test_task_skips_jobs_already_taken(self):
+        job = self.create_job(status='processing')
+
+        result = process_contacts_csv_task(str(job.id))
+
+        self.assertEqual(result['status'], 'skipped')
+        self.assertFalse(Contact.objects.exists())
+
+    def test_task_reclaims_stale_processing_job(self):
+        job = self.create_job(status='processing')
+        CsvUploadJob.objects.filter(id=job.id).update(
+            updated_at=timezone.now() - CSV_UPLOAD_STALE_AFTER - timedelta(minutes=1)
+        )
+
+        result = process_contacts_csv_task(str(job.id))
+
+        self.assertEqual(result['status'], 'success')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+
+    def test_task_marks_unreadable_upload_failed(self):
+        job = self.create_job()
+        default_storage.delete(job.file_path)
+
+        result = process_contacts_csv_task(str(job.id))
+
+        self.assertEqual(result['status'], 'error')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(job.error_message)
+
+    @mock.patch('calls.tasks.process_contacts_csv_task.delay')
+    def test_requeue_resends_only_stale_jobs(self, delay):
+        stale_job = self.create_job(status='processing')
+        self.create_job(status='processing')
+        self.create_job(status='completed')
+        CsvUploadJob.objects.filter(id=stale_job.id).update(
+            updated_at=timezone.now() - CSV_UPLOAD_STALE_AFTER - timedelta(minutes=1)
+        )
+
+        result = requeue_stale_csv_uploads()
+
+        self.assertEqual(result['requeued_uploads'], 1)
+        delay.assert_called_once_with(str(stale_job.id))
+
+
+class UploadStatusViewTests(CsvImportTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_job(self, **fields):
+        return CsvUploadJob.objects.create(
+            campaign=self.campaign,
+            file_path='csv_uploads/contacts.csv',
+            original_filename='contacts.csv',
+            agent_preference='Ali Khan',
+            created_by=self.user,
+            **fields
+        )
+
+    def get_status(self, upload_id):
+        return self.client.get(reverse('calls:csv_upload:upload_status', args=[upload_id]))
+
+    def test_completed_upload_reports_counts(self):
+        job = self.create_job(
+            status='completed', rows_processed=4, created_contacts=2, updated_contacts=1,
+            duplicates_skipped=1, errors=['Row 5: Phone number is required'], error_count=1
+        )
+
+        response = self.get_status(job.id)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.data['data']
+        self.assertEqual(data['status'], 'completed')
+        self.assertEqual(data['rows_processed'], 4)
+        self.assertEqual(data['total_processed'], 3)
+        self.assertEqual(data['errors'], ['Row 5: Phone number is required'])
+        self.assertEqual(data['error_count'], 1)
+
+    def test_processing_upload_reports_rows_read(self):
+        job = self.create_job(status='processing')
+        contact_import.set_progress(job.id, 2000)
+
+        response = self.get_status(job.id)
+
+        self.assertEqual(response.data['data']['rows_processed'], 2000)
+
+    def test_unknown_upload_is_not_found(self):
+        job = self.create_job()
+        job_id = job.id
+        job.delete()
+
+        response = self.get_status(job_id)
+
+        self.assertEqual(response.status_code, 404)
+
+
+class UploadCsvContactsViewTests(CsvImportTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self):
+        return self.client.post(
+            reverse('calls:csv_upload:upload_csv_contacts'),
+            {'csv_file': SimpleUploadedFile('contacts.csv', CONTACTS_CSV.encode('utf-8'), content_type='text/csv')},
+            format='multipart'
+        )
+
+    @mock.patch('calls.csv_upload_views.process_contacts_csv_task.delay')
+    def test_upload_queues_import(self, delay):
+        response = self.upload()
+
+        self.assertEqual(response.status_code, 202)
+        job = CsvUploadJob.objects.get(id=response.data['data']['upload_id'])
+        self.assertEqual(job.status, 'queued')
+        self.assertTrue(default_storage.exists(job.file_path))
+        delay.assert_called_once_with(str(job.id))
+
+    @mock.patch('calls.csv_upload_views.process_contacts_csv_task.delay', side_effect=ConnectionError('broker down'))
+    def test_upload_fails_job_when_queueing_fails(self, delay):
+        response = self.upload()
+
+        self.assertEqual(response.status_code, 500)
+        job = CsvUploadJob.objects.get()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('broker down', job.error_message)
+        self.assertFalse(default_storage.exists(job.file_path))
+
+
+class CacheOutageTests(TestCase):
+    """Saves must not depend on the cache behind the queue marker and template version"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='operator', password='secret')
+        broken_cache = mock.Mock()
+        broken_cache.get.side_effect = ConnectionError('cache down')
+        broken_cache.set.side_effect = ConnectionError('cache down')
+        broken_cache.delete.side_effect = ConnectionError('cache down')
+        broken_cache.incr.side_effect = ConnectionError('cache down')
+        broken_cache.get_or_set.side_effect = ConnectionError('cache down')
+        for module in (queue_marker, template_cache):
+            patcher = mock.patch.object(module, 'cache', broken_cache)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_queue_entry_saves_without_cache(self):
+        contact = Contact.objects.create(first_name='Ali', last_name='Khan', phone_number='+923001234567')
+
+        CallQueue.objects.create(contact=contact, scheduled_time=timezone.now(), created_by=self.user)
+
+        self.assertEqual(CallQueue.objects.filter(status='pending').count(), 1)
+        self.assertFalse(queue_marker.is_queue_idle(timezone.now()))
+
+    def test_template_saves_and_deletes_without_cache(self):
+        template = CallTemplate.objects.create(
+            name='Sales', template_type='sales', initial_greeting='Hello',
+            closing_message='Goodbye', created_by=self.user
+        )
+        template.delete()
+
+        self.assertIsNone(template_cache.current_version())
+
+
+class RetryBackoffTests(SimpleTestCase):
+
+    def test_delay_doubles_per_retry(self):
+        self.assertEqual(retry_backoff.countdown(0, 60, 3600), 60)
+        self.assertEqual(retry_backoff.countdown(1, 60, 3600), 120)
+        self.assertEqual(retry_backoff.countdown(2, 60, 3600), 240)
+
+    def test_delay_is_capped(self):
+        self.assertEqual(retry_backoff.countdown(10, 60, 3600), 3600)
+
+    @mock.patch('calls.services.retry_backoff.random.uniform', return_value=30.0)
+    def test_jitter_is_added_after_the_cap(self, uniform):
+        self.assertEqual(retry_backoff.countdown(10, 60, 3600, jitter=60), 3630)
+        uniform.assert_called_once_with(0, 60)
+
+
+class AllowedDaysTests(SimpleTestCase):
+
+    def test_mask_sets_one_bit_per_day(self):
+        # 1 = Monday (bit 0) ... 7 = Sunday (bit 6)
+        self.assertEqual(_allowed_days_mask([1, 3, 7]), 0b1000101)
+
+    def test_empty_or_invalid_days_allow_every_day(self):
+        self.assertEqual(_allowed_days_mask([]), ALL_DAYS_MASK)
+        self.assertEqual(_allowed_days_mask(None), ALL_DAYS_MASK)
+        self.assertEqual(_allowed_days_mask([0, 8]), ALL_DAYS_MASK)
+
+    def test_days_until_next_allowed_wraps_the_week(self):
+        weekdays = _allowed_days_mask([1, 2, 3, 4, 5])
+
+        self.assertEqual(_days_until_next_allowed(0, weekdays), 0)  # Monday
+        self.assertEqual(_days_until_next_allowed(5, weekdays), 2)  # Saturday
+        self.assertEqual(_days_until_next_allowed(6, weekdays), 1)  # Sunday
+        self.assertEqual(_days_until_next_allowed(1, _allowed_days_mask([1])), 6)
+
+
+class DispatchGuardTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = mock.Mock()
+        patcher = mock.patch.object(dispatch_guard, 'get_client', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_first_claim_wins(self):
+        self.redis.set.side_effect = [True, None]
+
+        self.assertTrue(dispatch_guard.claim_call_initiation('task-1'))
+        self.assertFalse(dispatch_guard.claim_call_initiation('task-1'))
+        self.redis.set.assert_called_with(
+            'twilio:init:task-1', 1, nx=True, ex=dispatch_guard.CALL_INITIATION_TIMEOUT
+        )
+
+    def test_release_drops_the_claim(self):
+        dispatch_guard.release_call_initiation('task-1')
+
+        self.redis.delete.assert_called_once_with('twilio:init:task-1')
+
+    def test_redis_outage_does_not_block_dialling(self):
+        self.redis.set.side_effect = redis.ConnectionError('redis down')
+        self.redis.delete.side_effect = redis.ConnectionError('redis down')
+
+        self.assertTrue(dispatch_guard.claim_call_initiation('task-1'))
+        dispatch_guard.release_call_initiation('task-1')
+
+
+class AiTwimlResponseTests(SimpleTestCase):
+
+    def build_twiml(self, ai_response, webhook_url, voice='alice'):
+        """The uncached VoiceResponse the cached template stands in for"""
+        response = VoiceResponse()
+        response.say(ai_response, voice=voice, language='en-US')
+        response.gather(input='speech', timeout=3, speech_timeout='auto', action=webhook_url, method='POST')
+        response.say("I didn't hear anything. Please try again.", voice=voice)
+        response.redirect(webhook_url)
+        return str(response)
+
+    def test_matches_voice_response_output(self):
+        ai_response = 'Tom & "Jerry" <b>say</b> hi'
+        webhook_url = 'https://example.com/voice/?call_id=1&next="gather"'
+
+        twiml = twilio_service.generate_ai_twiml_response(ai_response, gather_input=True, webhook_url=webhook_url)
+
+        self.assertEqual(twiml, self.build_twiml(ai_response, webhook_url))
+        self.assertIn('action="https://example.com/voice/?call_id=1&amp;next=&quot;gather&quot;"', twiml)
+
+    def test_gather_needs_a_webhook_url(self):
+        twiml = twilio_service.generate_ai_twiml_response('A < B', gather_input=True)
+
+        self.assertIn('A &lt; B', twiml)
+        self.assertNotIn('<Gather', twiml)
+        self.assertNotIn('TWIMLWEBHOOKURLTOKEN', twiml)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CallQueueTestCase(TestCase):
+    """Shared fixtures for the queue dispatch tests"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='dispatcher', password='secret')
+        self.contact = Contact.objects.create(first_name='Ali', last_name='Khan', phone_number='+923001234567')
+
+    def create_entry(self, minutes_ago=5, **fields):
+        return CallQueue.objects.create(
+            contact=self.contact,
+            scheduled_time=timezone.now() - timedelta(minutes=minutes_ago),
+            created_by=self.user,
+            **fields
+        )
+
+
+class ProcessCallQueueTests(CallQueueTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('calls.autonomous_agent.autonomous_agent_call')
+        self.agent_call = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_claims_ready_entries_and_records_task_ids(self):
+        entry = self.create_entry()
+        future_entry = self.create_entry(minutes_ago=-60)
+        self.agent_call.apply_async.return_value = mock.Mock(id='task-1')
+
+        result = process_call_queue(batch_size=10)
+
+        self.assertEqual(result['processed_calls'], 1)
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'in_progress')
+        self.assertEqual(entry.attempt_count, 1)
+        self.assertEqual(entry.task_id, 'task-1')
+        future_entry.refresh_from_db()
+        self.assertEqual(future_entry.status, 'pending')
+        self.assertEqual(self.agent_call.apply_async.call_args.kwargs['kwargs']['context_data']['queue_id'], entry.id)
+
+    def test_broker_error_hands_unsent_entries_back(self):
+        sent_entry = self.create_entry(minutes_ago=10)
+        unsent_entry = self.create_entry(minutes_ago=5)
+        self.agent_call.apply_async.side_effect = [mock.Mock(id='task-1'), BrokerOperationalError('broker down')]
+
+        result = process_call_queue(batch_size=10)
+
+        self.assertEqual(result['processed_calls'], 1)
+        sent_entry.refresh_from_db()
+        self.assertEqual(sent_entry.status, 'in_progress')
+        self.assertEqual(sent_entry.task_id, 'task-1')
+        # Back to pending without spending an attempt
+        unsent_entry.refresh_from_db()
+        self.assertEqual(unsent_entry.status, 'pending')
+        self.assertEqual(unsent_entry.attempt_count, 0)
+
+    def test_skips_entries_out_of_attempts(self):
+        self.create_entry(attempt_count=3)
+
+        result = process_call_queue(batch_size=10)
+
+        self.assertEqual(result['processed_calls'], 0)
+        self.agent_call.apply_async.assert_not_called()
+
+
+class BulkProcessCallQueueTests(CallQueueTestCase):
+
+    @mock.patch('calls.tasks.process_outbound_call')
+    def test_claims_batch_and_records_task_ids(self, outbound_call):
+        entry = self.create_entry()
+        outbound_call.apply_async.return_value = mock.Mock(id='task-1')
+
+        result = bulk_process_call_queue()
+
+        self.assertEqual(result['processed_items'], 1)
+        self.assertEqual(outbound_call.apply_async.call_args.kwargs['kwargs'], {'claimed': True})
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'in_progress')
+        self.assertEqual(entry.attempt_count, 1)
+        self.assertEqual(entry.task_id, 'task-1')
+
+
+class ProcessOutboundCallTests(CallQueueTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.twilio = mock.Mock(from_number='+15550000000')
+        self.guard = mock.Mock()
+        self.guard.claim_call_initiation.return_value = True
+        for name, replacement in (('twilio_service', self.twilio), ('dispatch_guard', self.guard)):
+            patcher = mock.patch(f'calls.tasks.{name}', replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_task(self, entry, **options):
+        return process_outbound_call.apply(args=[str(entry.id)], task_id='task-1', **options)
+
+    def test_successful_dial_completes_entry(self):
+        entry = self.create_entry()
+        self.twilio.initiate_call.return_value = {'success': True, 'call_sid': 'CA123'}
+
+        result = self.run_task(entry)
+
+        self.assertEqual(result.result['status'], 'success')
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'completed')
+        self.assertEqual(entry.attempt_count, 1)
+        self.assertEqual(entry.task_id, 'task-1')
+        self.assertEqual(entry.call.twilio_call_sid, 'CA123')
+        self.guard.claim_call_initiation.assert_called_once_with('task-1')
+
+    @mock.patch.object(process_outbound_call, 'retry', side_effect=Retry())
+    def test_failed_dial_repends_entry_and_retries(self, retry):
+        entry = self.create_entry()
+        self.twilio.initiate_call.return_value = {'success': False, 'error': 'busy'}
+
+        self.run_task(entry)
+
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'pending')
+        self.assertEqual(entry.attempt_count, 1)
+        self.assertEqual(Call.objects.get().status, 'failed')
+        self.assertEqual(retry.call_args.kwargs['args'], [str(entry.id)])
+        self.assertEqual(retry.call_args.kwargs['kwargs'], {'claimed': False})
+        self.guard.release_call_initiation.assert_called_once_with('task-1')
+
+    @mock.patch.object(process_outbound_call, 'retry', side_effect=Retry())
+    def test_error_before_dialling_releases_claims(self, retry):
+        entry = self.create_entry()
+        self.twilio.initiate_call.side_effect = ConnectionError('twilio down')
+
+        self.run_task(entry)
+
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'pending')
+        self.assertEqual(entry.attempt_count, 1)
+        self.assertEqual(retry.call_args.kwargs['kwargs'], {'claimed': False})
+        self.guard.release_call_initiation.assert_called_once_with('task-1')
+
+    def test_error_after_last_retry_fails_entry(self):
+        entry = self.create_entry()
+        self.twilio.initiate_call.side_effect = ConnectionError('twilio down')
+
+        result = self.run_task(entry, retries=process_outbound_call.max_retries)
+
+        self.assertEqual(result.result['status'], 'error')
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'failed')
+        self.assertIn('twilio down', entry.result_notes)
+
+    def test_redelivery_after_dialling_does_not_dial_again(self):
+        entry = self.create_entry(status='in_progress', attempt_count=1, task_id='task-1')
+        self.guard.claim_call_initiation.return_value = False
+
+        result = self.run_task(entry)
+
+        self.assertEqual(result.result['status'], 'deduped')
+        self.twilio.initiate_call.assert_not_called()
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'failed')
+
+    def test_entry_claimed_elsewhere_is_skipped(self):
+        entry = self.create_entry(status='in_progress', attempt_count=1, task_id='task-2')
+
+        result = self.run_task(entry)
+
+        self.assertEqual(result.result['status'], 'skipped')
+        self.twilio.initiate_call.assert_not_called()
+
+
+class ReapStaleQueueClaimsTests(CallQueueTestCase):
+
+    def test_returns_only_stale_unpublished_claims(self):
+        stale_entry = self.create_entry(status='in_progress', attempt_count=1)
+        fresh_entry = self.create_entry(status='in_progress', attempt_count=1)
+        published_entry = self.create_entry(status='in_progress', attempt_count=1, task_id='task-1')
+        CallQueue.objects.filter(id__in=[stale_entry.id, published_entry.id]).update(
+            updated_at=timezone.now() - STALE_CLAIM_TIMEOUT - timedelta(minutes=1)
+        )
+
+        result = reap_stale_queue_claims()
+
+        self.assertEqual(result['reaped_entries'], 1)
+        stale_entry.refresh_from_db()
+        self.assertEqual(stale_entry.status, 'pending')
+        self.assertEqual(stale_entry.attempt_count, 0)
+        for entry in (fresh_entry, published_entry):
+            entry.refresh_from_db()
+            self.assertEqual(entry.status, 'in_progress')
@@ -35,7 +35,7 @@ class CallQueueViewSet(viewsets.ModelViewSet):
     queryset = CallQueue.objects.all()
     serializer_class = CallQueueSerializer
     filterset_fields = ['status', 'priority']
-    ordering = ['priority', 'scheduled_time']
+    ordering = ['priority_rank', 'scheduled_time']
 
 class InitiateCallView(APIView):
     """API endpoint to initiate an outbound call"""
@@ -7,7 +7,7 @@ from django.utils import timezone
 from twilio.twiml.voice_response import VoiceResponse
 from twilio.request_validator import RequestValidator
 from django.conf import settings
-import json
+import orjson
 import logging
 
 from calls.models import Call, CallConversation
@@ -268,7 +268,7 @@ class AIResponseWebhook(View):
     
     def post(self, request):
         try:
-            data = json.loads(request.body)
+            data = orjson.loads(request.body)
             call_id = data.get('call_id')
             ai_response = data.get('response')
             
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-16 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contact',
+            name='do_not_call',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
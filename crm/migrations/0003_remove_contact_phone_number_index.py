@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-16 09:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0002_alter_contact_do_not_call'),
+    ]
+
+    operations = [
+        # phone_number is unique, so its unique index already serves lookups
+        migrations.RemoveIndex(
+            model_name='contact',
+            name='crm_contact_phone_n_e7ef8e_idx',
+        ),
+    ]
@@ -60,7 +60,7 @@ class Contact(models.Model):
     # Call preferences
     best_time_to_call = models.CharField(max_length=100, blank=True, null=True)
     timezone = models.CharField(max_length=50, default='UTC')
-    do_not_call = models.BooleanField(default=False)
+    do_not_call = models.BooleanField(default=False, db_index=True)
     
     # Custom fields (flexible JSON storage)
     custom_fields = models.JSONField(default=dict, blank=True)
@@ -72,7 +72,6 @@ class Contact(models.Model):
         db_table = 'crm_contacts'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['phone_number']),
             models.Index(fields=['email']),
             models.Index(fields=['contact_type']),
             models.Index(fields=['status']),
@@ -134,6 +134,11 @@ def main():
     print("   POST /api/v1/calls/csv/upload-contacts/")
     print("   Headers: Authorization: Bearer <token>")
     print("   Form-data: csv_file, campaign_name, agent_preference")
+    print("   Returns 202 with upload_id and status_url; the import runs in a Celery worker")
+    
+    print("\n🔗 Upload Status:")
+    print("   GET /api/v1/calls/csv/upload/<upload_id>/status/")
+    print("   Poll until status is 'completed' (contact counts, errors) or 'failed'")
     
     print("\n🔗 Upload Knowledge Base:")
     print("   POST /api/v1/calls/csv/upload-knowledge/")
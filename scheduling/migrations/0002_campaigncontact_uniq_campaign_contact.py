@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-16 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='campaigncontact',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='campaigncontact',
+            constraint=models.UniqueConstraint(fields=('campaign', 'contact'), name='uniq_campaign_contact'),
+        ),
+    ]
@@ -117,8 +117,11 @@ class CampaignContact(models.Model):
     
     class Meta:
         db_table = 'campaign_contacts'
-        unique_together = ['campaign', 'contact']
         ordering = ['scheduled_time', 'created_at']
+        # Conflict target for the CSV import's bulk_create(ignore_conflicts=True)
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'contact'], name='uniq_campaign_contact'),
+        ]
         indexes = [
             models.Index(fields=['campaign', 'status']),
             models.Index(fields=['scheduled_time']),
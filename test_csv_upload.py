@@ -6,9 +6,14 @@ Tests CSV upload functionality for contacts and knowledge base
 import requests
 import json
 import os
+import time
 
 BASE_URL = 'http://127.0.0.1:8000'
 
+# How often and how long to poll a queued contacts upload
+UPLOAD_POLL_INTERVAL = 2
+UPLOAD_POLL_TIMEOUT = 300
+
 def get_auth_token():
     """Get authentication token"""
     
@@ -48,24 +53,53 @@ def test_csv_contacts_upload(token):
             data=data
         )
     
-    if response.status_code == 201:
-        result = response.json()
-        print(f"✅ CSV Upload Successful!")
-        print(f"   📊 Campaign: {result['data']['campaign_name']}")
-        print(f"   👥 Created Contacts: {result['data']['created_contacts']}")
-        print(f"   🔄 Updated Contacts: {result['data']['updated_contacts']}")
-        print(f"   ❌ Errors: {result['data']['error_count']}")
-        
-        if result['data']['errors']:
-            print("   📝 Error Details:")
-            for error in result['data']['errors']:
-                print(f"      • {error}")
-        
-        return result['data']['campaign_id']
-    else:
+    if response.status_code != 202:
         print(f"❌ CSV Upload Failed: {response.status_code}")
         print(f"   📝 Error: {response.text}")
         return None
+    
+    # The import runs in a Celery worker; poll its status until it finishes
+    result = response.json()
+    print(f"⏳ CSV Upload Queued: {result['data']['upload_id']}")
+    print(f"   📊 Campaign: {result['data']['campaign_name']}")
+    
+    upload = wait_for_upload(headers, result['data']['status_url'])
+    if upload is None:
+        print(f"❌ CSV Upload did not finish within {UPLOAD_POLL_TIMEOUT}s (is a Celery worker running?)")
+        return None
+    
+    if upload['status'] != 'completed':
+        print(f"❌ CSV Import Failed: {upload['error_message']}")
+        return None
+    
+    print(f"✅ CSV Upload Successful!")
+    print(f"   👥 Created Contacts: {upload['created_contacts']}")
+    print(f"   🔄 Updated Contacts: {upload['updated_contacts']}")
+    print(f"   ❌ Errors: {upload['error_count']}")
+    
+    if upload['errors']:
+        print("   📝 Error Details:")
+        for error in upload['errors']:
+            print(f"      • {error}")
+    
+    return upload['campaign_id']
+
+def wait_for_upload(headers, status_url):
+    """Poll a contacts upload until it completes or fails; None on timeout"""
+    
+    deadline = time.monotonic() + UPLOAD_POLL_TIMEOUT
+    while time.monotonic() < deadline:
+        response = requests.get(status_url, headers=headers)
+        response.raise_for_status()
+        upload = response.json()['data']
+        
+        if upload['status'] in ('completed', 'failed'):
+            return upload
+        
+        print(f"   ⏳ {upload['status']}: {upload['rows_processed']} rows read")
+        time.sleep(UPLOAD_POLL_INTERVAL)
+    
+    return None
 
 def test_knowledge_base_upload(token):
     """Test knowledge base CSV upload"""